@@ -0,0 +1,209 @@
+"""
+Compares the vectorized export engine with the old per-row export loops.
+
+Usage:
+    python bench_export.py                 # 50,000 synthetic students
+    python bench_export.py 200000 --write  # bigger cohort, and include writing the .xlsx
+
+Both sides get the same synthetic documents (as returned by Mongo) and build the
+/export and /admin/export sheets; --write also times xlsxwriter on the results.
+"""
+import io
+import sys
+import time
+import random
+from collections import Counter
+
+import pandas as pd
+
+from export_engine import load_frame, leaderboard_sheets, admin_sheets, write_xlsx
+from profile_status import annotate
+from student_fields import normalize_filters, COMPLETE_BADGES
+
+ROUNDS = 3
+ERRORS = [None] * 14 + ["Profile Private", "Pending Verification", "Profile Not Found (404)",
+                        "Invalid Profile URL Format", "Rate Limited (429)", "Private URL - Cannot Access Data"]
+STATUSES = ["Champion 2026", "Innovator 2026", "Legend 2026"]
+
+
+def synthetic_students(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    students = []
+    for i in range(count):
+        statuses = rng.sample(STATUSES, rng.randint(0, 2))
+        certs = [f"Salesforce Certified Thing {n}" for n in range(rng.choice([0, 0, 1, 2, 4]))]
+        doc = annotate({
+            "points": rng.randint(0, 200000),
+            "badges": rng.randint(0, 60),
+            "certifications": certs,
+            "agentblazer_status": statuses,
+            "error": rng.choice(ERRORS),
+        })
+        students.append({
+            # Every 2000th roll number repeats the one before it, for the Duplicates sheet
+            "roll_number": f"21B{i - 1 if i % 2000 == 1 else i:06d}",
+            "name": f"Student {rng.choice('ABCDEFGH')}{i}",
+            "profile_url": f"https://www.salesforce.com/trailblazer/bench{i:08d}",
+            "points": doc["points"],
+            "badges": doc["badges"],
+            "certifications": certs,
+            "agentblazer_status": statuses,
+            "scrape_error": doc.get("error"),
+            "profile_status": doc["profile_status"],
+            "agentblazer_tier": doc["agentblazer_tier"],
+            "is_complete": doc["badges"] >= COMPLETE_BADGES,
+            "has_certifications": bool(certs),
+            "is_champion": "Champion 2026" in statuses,
+            "is_innovator": "Innovator 2026" in statuses,
+            "is_legend": "Legend 2026" in statuses,
+        })
+    students.sort(key=lambda s: (-s["points"], -s["badges"]))
+    return students
+
+
+def legacy_export(students, name=None, status="All", xp=None, badges=None, certs="All",
+                  champion="All", innovator="All", legend="All"):
+    """The per-row /export loop as it was before the export engine."""
+    public_data, private_data, invalid_url_data, duplicate_data = [], [], [], []
+    roll_counter = Counter(s.get("roll_number", "") for s in students)
+    duplicate_rolls = {roll for roll, count in roll_counter.items() if count > 1}
+
+    for idx, s in enumerate(students):
+        champion_status = "Yes" if any("Champion 2026" in x for x in s.get("agentblazer_status", [])) else "No"
+        innovator_status = "Yes" if any("Innovator 2026" in x for x in s.get("agentblazer_status", [])) else "No"
+        legend_status = "Yes" if any("Legend 2026" in x for x in s.get("agentblazer_status", [])) else "No"
+        url = s.get("profile_url", "")
+        is_trailhead = "trailblazer.me" in url or "salesforce.com/trailblazer" in url
+        error = str(s.get("scrape_error", ""))
+        error_lower = error.lower()
+        is_private = any(m in error_lower for m in ("access denied", "private", "hidden", "pending"))
+        is_invalid = any(m in error_lower for m in ("not found", "404", "navigation failed", "invalid"))
+        row = {
+            "Rank": idx + 1 if (not is_private and not is_invalid and is_trailhead) else "N/A",
+            "Roll Number": s.get("roll_number", ""), "Name": s.get("name", ""),
+            "Points": s.get("points", 0), "Badges": s.get("badges", 0),
+            "Certifications": ", ".join(s.get("certifications", [])),
+            "Champion 2026": champion_status, "Innovator 2026": innovator_status, "Legend 2026": legend_status,
+            "Profile URL": url, "Status": "Public", "Error Details": error if error and error != "None" else ""
+        }
+        if not is_private and not is_invalid and is_trailhead:
+            if name and name.lower() not in (s.get("name") or "").lower() \
+                    and name.lower() not in (s.get("roll_number") or "").lower():
+                continue
+            if status != "All" and ("Complete" if s.get("badges", 0) >= 10 else "In Progress") != status:
+                continue
+            if xp and s.get("points", 0) < int(xp):
+                continue
+            if badges and s.get("badges", 0) < int(badges):
+                continue
+            has_certs = len(s.get("certifications", [])) > 0
+            if (certs == "Yes" and not has_certs) or (certs == "No" and has_certs):
+                continue
+            if (champion == "Yes" and champion_status == "No") or (champion == "No" and champion_status == "Yes"):
+                continue
+            if (innovator == "Yes" and innovator_status == "No") or (innovator == "No" and innovator_status == "Yes"):
+                continue
+            if (legend == "Yes" and legend_status == "No") or (legend == "No" and legend_status == "Yes"):
+                continue
+            public_data.append(row)
+        elif not is_trailhead:
+            row["Status"] = "Invalid URL Format"
+            invalid_url_data.append(row)
+        elif is_private:
+            row["Status"] = "Private Profile"
+            private_data.append(row)
+        elif is_invalid:
+            row["Status"] = "Invalid/Not Found"
+            invalid_url_data.append(row)
+        if s.get("roll_number", "") in duplicate_rolls:
+            duplicate_data.append({**row, "Duplicate_Issue": "Duplicate Roll Number"})
+
+    return [("Leaderboard", pd.DataFrame(public_data)), ("Private Profiles", pd.DataFrame(private_data)),
+            ("Invalid URLs", pd.DataFrame(invalid_url_data)), ("Duplicates", pd.DataFrame(duplicate_data))]
+
+
+def legacy_admin(students):
+    """The per-row /admin/export loop as it was before the export engine."""
+    rows = []
+    for s in sorted(students, key=lambda s: s.get("roll_number", "")):
+        agentblazer = str(s.get("agentblazer_status", []))
+        champion = "✓" if "Champion 2026" in agentblazer else ""
+        innovator = "✓" if "Innovator 2026" in agentblazer else ""
+        legend = "✓" if "Legend 2026" in agentblazer else ""
+        module = "Legend 2026" if legend else "Innovator 2026" if innovator else "Champion 2026" if champion else "Not Started"
+        error = str(s.get("scrape_error") or "")
+        error_lower = error.lower()
+        status = "Valid"
+        if error:
+            if "invalid profile url format" in error_lower:
+                status = "Invalid Profile Format"
+            elif "private" in error_lower or "access" in error_lower or "hidden" in error_lower:
+                status = "Private URL"
+            elif "pending" in error_lower:
+                status = "Pending Verification"
+            elif "not found" in error_lower or "404" in error_lower:
+                status = "Profile Not Found"
+            else:
+                status = "Error"
+        rows.append({
+            "Roll Number": s.get("roll_number", ""), "Name": s.get("name", ""), "Profile URL": s.get("profile_url", ""),
+            "Points": s.get("points", 0), "Badges": s.get("badges", 0),
+            "Certifications": ", ".join(s.get("certifications", [])),
+            "Champion 2026": champion, "Innovator 2026": innovator, "Legend 2026": legend,
+            "Current Module": module, "Status": status, "Error Details": error
+        })
+    df = pd.DataFrame(rows)
+    sheets = [("All Students", df)]
+    for label, sheet in (("Valid", "Valid Profiles"), ("Private URL", "Private URLs"),
+                         ("Invalid Profile Format", "Invalid Format"), ("Profile Not Found", "Not Found"),
+                         ("Pending Verification", "Pending Verification")):
+        sheets.append((sheet, df[df["Status"] == label]))
+    return sheets
+
+
+def engine_export(students, **params):
+    return leaderboard_sheets(load_frame(students), normalize_filters(**params))
+
+
+def engine_admin(students):
+    return admin_sheets(load_frame(students))
+
+
+def best_of(fn, *args, write=False, **kwargs):
+    best = float("inf")
+    sheets = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        sheets = fn(*args, **kwargs)
+        if write:
+            write_xlsx([(name, frame) for name, frame in sheets if not frame.empty], io.BytesIO())
+        best = min(best, time.perf_counter() - start)
+    return best, sheets
+
+
+def main():
+    count = int(next((a for a in sys.argv[1:] if a.isdigit()), 50000))
+    write = "--write" in sys.argv
+    students = synthetic_students(count)
+    print(f"{count} students, best of {ROUNDS}{' (including xlsx write)' if write else ''}")
+
+    cases = [
+        ("/export (no filters)", legacy_export, engine_export, {}),
+        ("/export (filtered)", legacy_export, engine_export,
+         {"name": "a", "status": "Complete", "xp": "50000", "certs": "Yes", "champion": "Yes"}),
+        ("/admin/export", legacy_admin, engine_admin, {}),
+    ]
+    # The admin exports query students by roll number, so both sides get them in that order
+    by_roll = sorted(students, key=lambda s: s["roll_number"])
+    for label, legacy, engine, params in cases:
+        rows = by_roll if engine is engine_admin else students
+        legacy_s, legacy_sheets = best_of(legacy, rows, write=write, **params)
+        engine_s, engine_sheets = best_of(engine, rows, write=write, **params)
+        legacy_rows = sum(len(frame) for _, frame in legacy_sheets)
+        engine_rows = sum(len(frame) for _, frame in engine_sheets)
+        print(f"{label:24s} loop {legacy_s * 1000:8.1f}ms  engine {engine_s * 1000:8.1f}ms  "
+              f"x{legacy_s / engine_s:5.1f}  rows {legacy_rows}/{engine_rows}")
+
+
+if __name__ == "__main__":
+    main()
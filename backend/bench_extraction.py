@@ -0,0 +1,75 @@
+"""
+Compares the single page.evaluate extraction with the old locator-based one.
+
+Usage:
+    python bench_extraction.py                     # synthetic fixture with 25 certs
+    python bench_extraction.py saved_page.html ... # your own saved profile pages
+
+Saved pages must keep their shadow roots (e.g. declarative <template shadowrootmode="open">),
+which is what the synthetic fixture uses.
+"""
+import asyncio
+import sys
+import time
+
+from playwright.async_api import async_playwright
+
+from page_extract import extract_profile, extract_profile_with_locators
+
+ROUNDS = 20
+
+
+def build_fixture(cert_count: int = 25) -> str:
+    """Builds a profile-like page with tallies, certs and Agentblazer level inside shadow roots."""
+    certs = "".join(
+        f'<a href="/credentials/certification-detail?certificationId={i}">Salesforce Certified Thing {i}</a>'
+        for i in range(cert_count)
+    )
+    return f"""
+    <html><body>
+      <lwc-tbui-tally><template shadowrootmode="open"><span class="tally__count">12,345</span></template></lwc-tbui-tally>
+      <lwc-tbui-tally><template shadowrootmode="open"><span class="tally__count">67</span></template></lwc-tbui-tally>
+      <lwc-tbme-certifications><template shadowrootmode="open">{certs}</template></lwc-tbme-certifications>
+      <lwc-tbme-agentblazer-level><template shadowrootmode="open"><span>Innovator 2026</span></template></lwc-tbme-agentblazer-level>
+    </body></html>
+    """
+
+
+async def time_rounds(page, extractor):
+    result = None
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = await extractor(page)
+    return (time.perf_counter() - start) * 1000 / ROUNDS, result
+
+
+async def main(paths):
+    fixtures = [(p, open(p, encoding="utf-8").read()) for p in paths] or [("synthetic (25 certs)", build_fixture())]
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        try:
+            for name, html in fixtures:
+                # Serve through a real navigation so the HTML parser attaches declarative shadow roots
+                await page.route("http://bench.local/", lambda route, body=html: route.fulfill(body=body, content_type="text/html"))
+                await page.goto("http://bench.local/")
+                await page.unroute("http://bench.local/")
+                evaluate_ms, evaluate_result = await time_rounds(page, extract_profile)
+                locator_ms, locator_result = await time_rounds(page, extract_profile_with_locators)
+
+                same = (
+                    sorted(evaluate_result["counts"]) == sorted(locator_result["counts"])
+                    and sorted(evaluate_result["certifications"]) == sorted(locator_result["certifications"])
+                    and evaluate_result["agentblazer_status"] == locator_result["agentblazer_status"]
+                )
+                print(f"{name}:")
+                print(f"  page.evaluate: {evaluate_ms:8.1f} ms/extraction")
+                print(f"  locators:      {locator_ms:8.1f} ms/extraction ({locator_ms / max(evaluate_ms, 0.001):.1f}x)")
+                print(f"  results match: {same}")
+        finally:
+            await browser.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
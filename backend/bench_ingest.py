@@ -0,0 +1,87 @@
+"""
+Times /upload's roster ingestion on a synthetic roster, without the database writes.
+
+Usage:
+    python bench_ingest.py           # 20,000 rows
+    python bench_ingest.py 100000
+
+Per format, each round reads the roster a chunk at a time and validates, diffs and
+builds the upserts exactly as ingest_chunk() does; half of the roll numbers are
+already "stored" (a tenth of those with a new URL), standing in for the $in lookup.
+"""
+import io
+import sys
+import time
+import random
+
+import openpyxl
+
+from profile_api import canonical_profile_id
+from roster_ingest import IngestReport, read_roster, roster_writes, scrape_targets
+
+ROUNDS = 3
+
+
+def synthetic_roster(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        url = rng.choice([
+            f"https://www.salesforce.com/trailblazer/bench{i:08d}",
+            f"https://trailblazer.me/id/bench{i:08d}",
+            "https://example.com/not-a-profile",
+            "",
+        ] if i % 50 == 0 else [f"https://www.salesforce.com/trailblazer/bench{i:08d}"])
+        # Every 1000th roll number repeats the one before it
+        rows.append((f"21B{i - 1 if i % 1000 == 1 else i:06d}", f"Student {i}", url))
+    stored = [{"roll_number": roll, "name": name, "profile_url": url if i % 10 else url + "x",
+               "profile_id": canonical_profile_id(url if i % 10 else url + "x")}
+              for i, (roll, name, url) in enumerate(rows) if i % 2 == 0]
+    return rows, stored
+
+
+def roster_files(rows) -> dict:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Roll Number", "Name", "Profile URL"])
+    for row in rows:
+        sheet.append(row)
+    xlsx = io.BytesIO()
+    workbook.save(xlsx)
+
+    csv = io.BytesIO()
+    csv.write(b"Roll Number,Name,Profile URL\n")
+    csv.write("".join(f"{roll},{name},{url}\n" for roll, name, url in rows).encode("utf-8"))
+    return {"roster.xlsx": xlsx, "roster.csv": csv}
+
+
+def ingest(file, filename: str, stored_by_roll: dict):
+    report = IngestReport()
+    upserts = targets = 0
+    for chunk in read_roster(file, filename):
+        rows = report.add(chunk)
+        stored = [stored_by_roll[roll] for roll in rows["roll_number"] if roll in stored_by_roll]
+        rows = report.diff(rows, stored)
+        upserts += len(roster_writes(rows))
+        targets += len(scrape_targets(rows))
+    return report.summary(), upserts, targets
+
+
+def main():
+    count = int(next((a for a in sys.argv[1:] if a.isdigit()), 20000))
+    rows, stored = synthetic_roster(count)
+    stored_by_roll = {s["roll_number"]: s for s in stored}
+    print(f"{count} roster rows, best of {ROUNDS}")
+
+    for filename, file in roster_files(rows).items():
+        best = float("inf")
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            summary, upserts, targets = ingest(file, filename, stored_by_roll)
+            best = min(best, time.perf_counter() - start)
+        print(f"{filename:12s} {best * 1000:8.1f}ms  {count / best:9.0f} rows/s  "
+              f"upserts {upserts}  scrapes {targets}  counts {summary['counts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of warm context+page slots, and when a slot's context gets thrown away
+POOL_SIZE = int(os.getenv("SCRAPE_POOL_SIZE", "5"))
+RECYCLE_AFTER_NAVIGATIONS = int(os.getenv("SCRAPE_RECYCLE_AFTER", "200"))
+RECYCLE_ABOVE_HEAP_MB = int(os.getenv("SCRAPE_RECYCLE_HEAP_MB", "512"))
+
+CONTEXT_OPTIONS = {
+    "viewport": {"width": 1920, "height": 1080},
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
+    "extra_http_headers": {
+        "Accept-Language": "en-US,en;q=0.9",
+        "sec-ch-ua": '"Google Chrome";v="129", "Not=A?Brand";v="8", "Chromium";v="129"',
+        "sec-ch-ua-mobile": "?0",
+        "sec-ch-ua-platform": '"Windows"',
+        "Upgrade-Insecure-Requests": "1"
+    }
+}
+
+
+class PooledPage:
+    """A warm page together with the context it owns and its usage counters."""
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.navigations = 0
+        self.crashed = False
+        page.on("crash", self._on_crash)
+
+    def _on_crash(self, *args):
+        self.crashed = True
+
+
+class BrowserPool:
+    """
+    Fixed-size pool of browser contexts, each holding one reusable page.
+    Slots are recycled after RECYCLE_AFTER_NAVIGATIONS uses or when the page's JS heap
+    grows past RECYCLE_ABOVE_HEAP_MB, and crashed slots are replaced transparently.
+    """
+
+    def __init__(self, browser, size: int = POOL_SIZE,
+                 recycle_after: int = RECYCLE_AFTER_NAVIGATIONS,
+                 recycle_heap_mb: int = RECYCLE_ABOVE_HEAP_MB):
+        self.browser = browser
+        self.size = size
+        self.recycle_after = recycle_after
+        self.recycle_heap_mb = recycle_heap_mb
+        self.idle = asyncio.Queue()
+        self.created = 0
+        self.recycled = 0
+        self.lock = asyncio.Lock()
+
+    async def _new_slot(self):
+        context = await self.browser.new_context(**CONTEXT_OPTIONS)
+        # Block heavy resources - 'other' stays allowed as it may carry API calls
+        await context.route("**/*", lambda route: route.abort()
+            if route.request.resource_type in ["image", "media", "font"]
+            else route.continue_())
+        page = await context.new_page()
+        return PooledPage(context, page)
+
+    async def acquire(self) -> PooledPage:
+        """Returns an idle slot, creating one if the pool isn't full yet, else waits."""
+        while True:
+            async with self.lock:
+                if self.idle.empty() and self.created < self.size:
+                    self.created += 1
+                    try:
+                        return await self._new_slot()
+                    except Exception:
+                        self.created -= 1
+                        raise
+            try:
+                # Wake up periodically in case a failed recycle freed a slot to create
+                return await asyncio.wait_for(self.idle.get(), 1.0)
+            except asyncio.TimeoutError:
+                continue
+
+    async def _heap_mb(self, slot: PooledPage) -> float:
+        try:
+            used = await slot.page.evaluate("performance.memory ? performance.memory.usedJSHeapSize : 0")
+            return used / (1024 * 1024)
+        except Exception:
+            return 0.0
+
+    async def release(self, slot: PooledPage):
+        """Returns a slot to the pool, recycling its context when it is worn out or broken."""
+        slot.navigations += 1
+        recycle = slot.crashed or slot.page.is_closed() or slot.navigations >= self.recycle_after
+        if not recycle and self.recycle_heap_mb:
+            recycle = await self._heap_mb(slot) > self.recycle_heap_mb
+
+        if not recycle:
+            try:
+                # Drop the previous profile document so the warm page holds no state
+                await slot.page.goto("about:blank")
+            except Exception:
+                recycle = True
+
+        if recycle:
+            logger.info(f"Recycling browser context after {slot.navigations} navigations (crashed={slot.crashed})")
+            self.recycled += 1
+            try:
+                await slot.context.close()
+            except Exception:
+                pass
+            try:
+                slot = await self._new_slot()
+            except Exception as e:
+                logger.error(f"Could not replace browser context: {e}")
+                async with self.lock:
+                    self.created -= 1
+                return
+
+        self.idle.put_nowait(slot)
+
+    async def close(self):
+        """Closes every idle context. Call after all scrapes have released their slots."""
+        while not self.idle.empty():
+            slot = self.idle.get_nowait()
+            try:
+                await slot.context.close()
+            except Exception:
+                pass
+        self.created = 0
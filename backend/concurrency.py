@@ -0,0 +1,163 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MIN_CONCURRENCY = int(os.getenv("SCRAPE_MIN_CONCURRENCY", "1"))
+MAX_CONCURRENCY = int(os.getenv("SCRAPE_MAX_CONCURRENCY", "20"))
+# A healthy scrape that takes longer than this still counts as a congestion signal
+LATENCY_TARGET_SECONDS = float(os.getenv("SCRAPE_LATENCY_TARGET_S", "30"))
+
+# Error texts that mean "slow down", as opposed to a private or missing profile
+THROTTLE_MARKERS = ["429", "503", "rate limit", "timeout", "network error"]
+
+
+def is_throttle_signal(data: dict) -> bool:
+    """True if a scrape result looks like Trailhead pushing back rather than a profile problem."""
+    error = str(data.get("error") or "").lower()
+    return any(marker in error for marker in THROTTLE_MARKERS)
+
+
+class ScrapeSlot:
+    """Handle given to the caller of AdaptiveLimiter.slot() to report how the scrape went."""
+
+    def __init__(self):
+        self.congested = False
+        self.reason = None
+        self.counted = True
+
+    def report(self, data: dict):
+        # A cache hit never reached Trailhead, so it says nothing about its health
+        if data.get("from_cache"):
+            self.counted = False
+            return
+        if is_throttle_signal(data):
+            self.congested = True
+            self.reason = data.get("error")
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter for scrapes.
+    The limit grows by one after each window of `limit` healthy completions and is
+    halved on a timeout, 429/503, navigation failure or slow completion. Decreases
+    are ignored for scrapes that started before the previous decrease, so one burst
+    of failures only backs off once.
+    """
+
+    def __init__(self, initial: int, min_limit: int = MIN_CONCURRENCY, max_limit: int = MAX_CONCURRENCY,
+                 latency_target: float = LATENCY_TARGET_SECONDS, name: str = "scrape"):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.latency_target = latency_target
+        self.name = name
+        self.in_flight = 0
+        self.healthy_streak = 0
+        self.last_decrease = 0.0
+        self.decisions = deque(maxlen=50)
+        self.condition = asyncio.Condition()
+
+    def _decide(self, action: str, reason: str):
+        self.decisions.append({
+            "at": datetime.now().isoformat(),
+            "action": action,
+            "limit": self.limit,
+            "reason": reason
+        })
+        logger.info(f"[{self.name} limiter] {action} -> {self.limit} ({reason})")
+
+    async def acquire(self) -> float:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started: float, congested: bool = False, reason: str = None, counted: bool = True):
+        latency = time.monotonic() - started
+        async with self.condition:
+            self.in_flight -= 1
+            if counted and not congested and latency > self.latency_target:
+                congested = True
+                reason = f"slow scrape ({latency:.1f}s)"
+
+            if not counted:
+                # Served without touching Trailhead (e.g. a cache hit): no signal either way
+                pass
+            elif congested:
+                self.healthy_streak = 0
+                if started > self.last_decrease and self.limit > self.min_limit:
+                    self.limit = max(self.min_limit, self.limit // 2)
+                    self.last_decrease = time.monotonic()
+                    self._decide("decrease", reason or "congestion")
+            else:
+                self.healthy_streak += 1
+                if self.healthy_streak >= self.limit and self.limit < self.max_limit:
+                    self.healthy_streak = 0
+                    self.limit += 1
+                    self._decide("increase", f"{self.limit - 1} healthy scrapes")
+            self.condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        async with limiter.slot() as slot:
+            data = await scraper.scrape_profile(url)
+            slot.report(data)
+        An exception inside the block counts as congestion.
+        """
+        started = await self.acquire()
+        slot = ScrapeSlot()
+        try:
+            yield slot
+        except Exception as e:
+            slot.congested = True
+            slot.reason = str(e)
+            raise
+        finally:
+            await self.release(started, slot.congested, slot.reason, slot.counted)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "decisions": list(self.decisions)
+        }
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight call and its result.
+    The call runs to completion even if the caller that started it is cancelled.
+    """
+
+    def __init__(self, name: str = "single-flight"):
+        self.name = name
+        self.flights = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        """Awaits fn() for this key, or joins the call already running for it. key=None never shares."""
+        if key is None:
+            return await fn()
+        task = self.flights.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            self.flights[key] = task
+            task.add_done_callback(lambda _: self.flights.pop(key, None))
+        else:
+            self.shared += 1
+            logger.info(f"[{self.name}] joined in-flight call for {key}")
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> dict:
+        return {"in_flight": len(self.flights), "started": self.started, "shared": self.shared}
@@ -1,19 +1,140 @@
 import asyncio
+import hashlib
 import json
 import os
 import sys
-from datetime import datetime
+import tempfile
+from datetime import datetime, timedelta
 
 # Ensure the script can find scraper.py in the same directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 try:
-    from scraper import scraper
+    from parallel_scrape import scrape_in_processes, SCRAPE_WORKERS, SCRAPE_TABS_PER_WORKER
+    from ranking import assign_ranks
 except ImportError:
     # Fallback if specific package structure is used
     sys.path.append(os.path.join(current_dir, ".."))
-    from backend.scraper import scraper
+    from backend.parallel_scrape import scrape_in_processes, SCRAPE_WORKERS, SCRAPE_TABS_PER_WORKER
+    from backend.ranking import assign_ranks
+
+# Results are appended here as they arrive so a killed run can resume
+JOURNAL_PATH = os.getenv("DAILY_SCRAPE_JOURNAL", os.path.join(current_dir, ".daily-scrape-journal.jsonl"))
+# A journal older than this belongs to a previous day's run and is discarded
+RUN_WINDOW_HOURS = float(os.getenv("DAILY_SCRAPE_WINDOW_HOURS", "20"))
+
+
+class ScrapeJournal:
+    """
+    Append-only JSONL log of one daily run: a header line with the run's start
+    time and a hash of its input file, then one line per scraped student. Each
+    line is flushed and fsynced, so at most the line being written when the
+    process died is lost.
+    """
+
+    def __init__(self, path: str, input_hash: str = None, window_hours: float = RUN_WINDOW_HOURS):
+        self.path = path
+        self.input_hash = input_hash
+        self.window = timedelta(hours=window_hours)
+        self.run_started = None
+        self.entries = {}  # student index -> journal entry
+        self.file = None
+
+    def open(self):
+        """
+        Loads the current run's entries, or starts a new run if there is none.
+        A journal written against a different input file is never resumed
+        (e.g. a cache restore that brought back a journal but not its output).
+        """
+        header, entries = self._read()
+        started = datetime.fromisoformat(header["run_started"]) if header else None
+        same_input = bool(header) and header.get("input_hash") == self.input_hash
+        if started and same_input and datetime.now() - started < self.window:
+            self.run_started = started
+            self.entries = entries
+            self.file = open(self.path, "a", encoding="utf-8")
+            if not self._ends_with_newline():
+                # Terminate a torn last line so the next entry starts on its own
+                self.file.write("\n")
+        else:
+            self.run_started = datetime.now()
+            self.entries = {}
+            self.file = open(self.path, "w", encoding="utf-8")
+            self._write({"run_started": self.run_started.isoformat(), "input_hash": self.input_hash})
+        return self
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return None, {}
+        header, entries = None, {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn final line from a killed run
+                    continue
+                if header is None:
+                    header = record if "run_started" in record else None
+                    if header is None:
+                        return None, {}
+                else:
+                    entries[record["index"]] = record
+        return header, entries
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _write(self, record: dict):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def done(self, idx: int, student: dict) -> bool:
+        """True if this student was scraped earlier in the run (and not just a transient failure)."""
+        entry = self.entries.get(idx)
+        return bool(entry
+                    and entry["roll_number"] == student.get("roll_number")
+                    and entry["profile_url"] == student.get("profile_url")
+                    and entry["data"].get("profile_status") != "transient_error")
+
+    def record(self, idx: int, student: dict, data: dict):
+        entry = {"index": idx, "roll_number": student.get("roll_number"),
+                 "profile_url": student.get("profile_url"), "data": data}
+        self.entries[idx] = entry
+        self._write(entry)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def finish(self):
+        """The run's output is saved; the next run starts from scratch."""
+        self.close()
+        os.remove(self.path)
+
+
+def write_atomically(path: str, students: list):
+    """Writes the JSON next to its destination, then swaps it in, so readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(students, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
 
 async def main():
     # Define path to the static JSON file used by frontend
@@ -28,56 +149,70 @@ async def main():
     print(f"📂 Loading data from: {json_path}")
     
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            students = json.load(f)
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+        students = json.loads(raw.decode('utf-8'))
     except Exception as e:
         print(f"❌ Error loading JSON: {e}")
         return
 
     print(f"🚀 Starting daily scrape for {len(students)} students...")
-    await scraper.start()
-    
-    # Use a semaphore to limit concurrent browser tabs (GitHub Actions is resource constrained)
-    sem = asyncio.Semaphore(3)
     
+    # The journal only resumes against the exact file it was started on
+    journal = ScrapeJournal(JOURNAL_PATH, input_hash=hashlib.sha256(raw).hexdigest()).open()
     updated_count = 0
-    
-    async def process_student(student):
+
+    def apply_result(idx, data):
         nonlocal updated_count
-        async with sem:
-            url = student.get('profile_url')
-            # Skip invalid/missing URLs
-            if not url or "salesforce.com" not in url:
-                return
-
-            print(f"🔍 Scraping {student.get('roll_number', 'Unknown')}")
-            try:
-                # Scrape data
-                data = await scraper.scrape_profile(url)
-                
-                # Update student record
-                student['points'] = data.get('points', 0)
-                student['badges'] = data.get('badges', 0)
-                student['certifications'] = data.get('certifications', [])
-                student['agentblazer_status'] = data.get('agentblazer_status', [])
-                
-                # Update status flags
-                student['scrape_error'] = data.get('error')
-                student['is_scraping'] = False
-                student['last_updated'] = datetime.now().isoformat()
-                
-                updated_count += 1
-                
-            except Exception as e:
-                print(f"⚠️ Error scraping {url}: {e}")
-                student['scrape_error'] = str(e)
-
-    # Create and run all tasks
-    tasks = [process_student(s) for s in students]
-    await asyncio.gather(*tasks)
-
-    print("🛑 Closing browser...")
-    await scraper.stop()
+        student = students[idx]
+
+        # Update student record (a transient failure keeps the last scraped numbers)
+        if data.get('profile_status') != "transient_error":
+            student['points'] = data.get('points', 0)
+            student['badges'] = data.get('badges', 0)
+            student['certifications'] = data.get('certifications', [])
+            student['agentblazer_status'] = data.get('agentblazer_status', [])
+            student['agentblazer_tier'] = data.get('agentblazer_tier')
+        
+        # Update status flags
+        student['scrape_error'] = data.get('error')
+        student['profile_status'] = data.get('profile_status')
+        student['is_scraping'] = False
+        student['last_updated'] = data.get('scraped_at') or datetime.now().isoformat()
+        
+        updated_count += 1
+
+    def save_result(idx, data):
+        student = students[idx]
+        print(f"🔍 Scraped {student.get('roll_number', 'Unknown')}")
+        data = {**data, 'scraped_at': datetime.now().isoformat()}
+        journal.record(idx, student, data)
+        apply_result(idx, data)
+
+    # Results journaled earlier in this run are applied instead of scraped again
+    resumed = 0
+    for idx, entry in journal.entries.items():
+        if idx < len(students) and entry["roll_number"] == students[idx].get("roll_number") \
+                and entry["profile_url"] == students[idx].get("profile_url"):
+            apply_result(idx, entry["data"])
+            resumed += 1
+    if resumed:
+        print(f"♻️ Resuming run started {journal.run_started.isoformat()}: {resumed} results from the journal")
+
+    # Skip invalid/missing URLs and students already done in this run
+    work = [(idx, s['profile_url']) for idx, s in enumerate(students)
+            if s.get('profile_url') and "salesforce.com" in s['profile_url'] and not journal.done(idx, s)]
+    print(f"🧾 {len(work)} profiles left to scrape")
+
+    # Shard across SCRAPE_WORKERS processes, SCRAPE_TABS_PER_WORKER tabs each
+    # (GitHub Actions is resource constrained, so both default low)
+    try:
+        report = await scrape_in_processes(work, save_result, workers=SCRAPE_WORKERS, tabs=SCRAPE_TABS_PER_WORKER)
+    finally:
+        # Whatever finished is in the journal; the next run picks up from there
+        journal.close()
+    print(f"⏱️ {report['pages']} pages in {report['elapsed_seconds']}s "
+          f"({report['pages_per_minute']} pages/min, {report['workers']} workers x {report['tabs_per_worker']} tabs)")
 
     # Recalculate Ranks
     print("📊 Recalculating ranks...")
@@ -85,17 +220,16 @@ async def main():
         # Sort by Points (desc), then Badges (desc)
         students.sort(key=lambda x: (x.get('points', 0), x.get('badges', 0)), reverse=True)
         
-        # Assign ranks
-        for idx, s in enumerate(students):
-            s['rank'] = idx + 1
+        # Assign ranks (ties share one, as on the API)
+        assign_ranks(students)
             
     except Exception as e:
         print(f"⚠️ Error sorting/ranking: {e}")
 
     # Save updated data
     print(f"💾 Saving {updated_count} updated records to {json_path}")
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(students, f, indent=4)
+    write_atomically(json_path, students)
+    journal.finish()
     
     print("✅ Daily scrape completed successfully.")
 
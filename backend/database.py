@@ -20,6 +20,8 @@ except Exception as e:
 db = client[DB_NAME]
 students_collection = db["students"]
 settings_collection = db["settings"]
+scrape_jobs_collection = db["scrape_jobs"]
+scrape_cache_collection = db["scrape_cache"]
 
 def get_database():
     return db
@@ -0,0 +1,387 @@
+"""
+Export pipeline shared by /export and /admin/export.
+
+Students are loaded into one DataFrame; status categories, Agentblazer flags,
+ranks and filters are column operations over shared masks, and each endpoint
+just picks its sheets from them.
+"""
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from profile_status import (classify, PUBLIC, PRIVATE, PENDING, NOT_FOUND, INVALID_FORMAT,
+                            TRANSIENT_ERROR, RANKED_STATUSES)
+from student_fields import FLAG_FILTERS
+
+logger = logging.getLogger(__name__)
+
+# Rows per Mongo batch for the streamed csv/parquet exports
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+STREAM_CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_FORMATS = list(MEDIA_TYPES)
+
+# Everything the exports read; pass as the Mongo projection
+EXPORT_PROJECTION = {
+    "_id": 0, "roll_number": 1, "name": 1, "profile_url": 1, "points": 1, "badges": 1,
+    "certifications": 1, "scrape_error": 1, "profile_status": 1, "agentblazer_tier": 1,
+    "is_complete": 1, "has_certifications": 1, "is_champion": 1, "is_innovator": 1, "is_legend": 1,
+}
+
+TEXT_FIELDS = ["roll_number", "name", "profile_url"]
+FLAG_FIELDS = ["is_complete", "has_certifications", "is_champion", "is_innovator", "is_legend"]
+
+LEADERBOARD_COLUMNS = ["Rank", "Roll Number", "Name", "Points", "Badges", "Certifications",
+                       "Champion 2026", "Innovator 2026", "Legend 2026", "Profile URL", "Status", "Error Details"]
+ADMIN_COLUMNS = ["Roll Number", "Name", "Profile URL", "Points", "Badges", "Certifications",
+                 "Champion 2026", "Innovator 2026", "Legend 2026", "Current Module", "Status", "Error Details"]
+
+ADMIN_STATUS_LABELS = {
+    PUBLIC: "Valid",
+    PRIVATE: "Private URL",
+    PENDING: "Pending Verification",
+    NOT_FOUND: "Profile Not Found",
+    INVALID_FORMAT: "Invalid Profile Format",
+    TRANSIENT_ERROR: "Error",
+}
+CURRENT_MODULE_LABELS = {"legend": "Legend 2026", "innovator": "Innovator 2026", "champion": "Champion 2026"}
+
+
+def _join_certifications(values) -> list:
+    # A plain comprehension: Series.map(lambda) costs several times as much per row
+    return [", ".join(c) if c and type(c) is list else "" for c in values]
+
+
+def load_frame(students: list, first_rank: int = 1, previous=None) -> pd.DataFrame:
+    """
+    One row per student, in the order given, with missing fields defaulted the way
+    the per-row exports used to. In leaderboard order, `rank` is the competition
+    rank (ties share one) counting from position first_rank; `previous` is the
+    (points, badges, rank) of the student just before this batch, if any.
+    """
+    fields = [f for f in EXPORT_PROJECTION if f != "_id"]
+    # Object columns skip per-column dtype inference; each field is typed once below
+    df = pd.DataFrame(students, columns=fields, dtype=object)
+
+    for field in TEXT_FIELDS:
+        # Plain object strings: pandas' string dtype makes the later .str filters slower
+        df[field] = df[field].fillna("").astype(str).astype(object)
+    for field in ("points", "badges"):
+        df[field] = pd.to_numeric(df[field], errors="coerce").fillna(0).astype("int64")
+    for field in FLAG_FIELDS:
+        df[field] = df[field].eq(True)
+
+    error = df["scrape_error"].fillna("").astype(str)
+    df["error_details"] = error.mask(error == "None", "")
+    # Written before profile_status existed and not yet backfilled
+    status = df["profile_status"].astype(object)
+    missing = status.isna()
+    if missing.any():
+        status[missing] = df.loc[missing, "error_details"].map(classify)
+    df["profile_status"] = status
+
+    df["certifications_text"] = _join_certifications(df["certifications"].tolist())
+    df["rank"] = competition_ranks(df["points"].to_numpy(), df["badges"].to_numpy(), first_rank, previous)
+    return df
+
+
+def competition_ranks(points: np.ndarray, badges: np.ndarray, first_position: int = 1, previous=None) -> np.ndarray:
+    """ranking.assign_ranks() over columns: each row takes the position where its (points, badges) tier starts."""
+    positions = np.arange(first_position, first_position + len(points))
+    if not len(points):
+        return positions
+    starts = np.ones(len(points), dtype=bool)
+    starts[1:] = (points[1:] != points[:-1]) | (badges[1:] != badges[:-1])
+    ranks = positions[np.maximum.accumulate(np.where(starts, np.arange(len(points)), 0))]
+    if previous is not None and (points[0], badges[0]) == tuple(previous[:2]):
+        # The batch opens partway through the previous batch's tie
+        ranks[ranks == first_position] = previous[2]
+    return ranks
+
+
+def filter_mask(df: pd.DataFrame, filters: dict) -> pd.Series:
+    """Rows passing student_fields.normalize_filters() output; same rules as search_query()."""
+    mask = np.ones(len(df), dtype=bool)
+    if filters.get("complete") is not None:
+        mask &= df["is_complete"].to_numpy() == filters["complete"]
+    if filters.get("min_points") is not None:
+        mask &= df["points"].to_numpy() >= filters["min_points"]
+    if filters.get("min_badges") is not None:
+        mask &= df["badges"].to_numpy() >= filters["min_badges"]
+    for key, field in FLAG_FILTERS.items():
+        if filters.get(key) is not None:
+            mask &= df[field].to_numpy() == filters[key]
+    term = filters.get("name")
+    if term:
+        # The only per-row test, so it runs last and only over rows still in
+        rows = np.flatnonzero(mask)
+        names, rolls = df["name"].to_numpy(), df["roll_number"].to_numpy()
+        mask[rows] = [term in names[i].lower() or term in rolls[i].lower() for i in rows]
+    return pd.Series(mask, index=df.index)
+
+
+def _yes_no(flags: pd.Series) -> np.ndarray:
+    return np.where(flags, "Yes", "No")
+
+
+def _leaderboard_rows(df: pd.DataFrame, ranked: pd.Series, status) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Rank": df["rank"].astype(object).where(ranked, "N/A"),
+        "Roll Number": df["roll_number"],
+        "Name": df["name"],
+        "Points": df["points"],
+        "Badges": df["badges"],
+        "Certifications": df["certifications_text"],
+        "Champion 2026": _yes_no(df["is_champion"]),
+        "Innovator 2026": _yes_no(df["is_innovator"]),
+        "Legend 2026": _yes_no(df["is_legend"]),
+        "Profile URL": df["profile_url"],
+        "Status": status,
+        "Error Details": df["error_details"],
+    }, columns=LEADERBOARD_COLUMNS)
+
+
+def _or_message(df: pd.DataFrame, message: str) -> pd.DataFrame:
+    return df if not df.empty else pd.DataFrame({"Message": [message]})
+
+
+def leaderboard_table(df: pd.DataFrame, filters: dict) -> pd.DataFrame:
+    """Just the Leaderboard sheet: ranked profiles passing the filters."""
+    ranked = df["profile_status"].isin(RANKED_STATUSES)
+    public = ranked & filter_mask(df, filters)
+    return _leaderboard_rows(df[public], ranked[public], "Public")
+
+
+LEADERBOARD_SHEETS = [
+    ("Leaderboard", "No matching profiles found with current filters"),
+    ("Private Profiles", "No private profiles found"),
+    ("Invalid URLs", "No invalid URLs found"),
+]
+# Only added when it has rows; always the last sheet
+DUPLICATES_SHEET = "Duplicates"
+
+ADMIN_SUBSETS = [("Valid", "Valid Profiles"), ("Private URL", "Private URLs"),
+                 ("Invalid Profile Format", "Invalid Format"), ("Profile Not Found", "Not Found"),
+                 ("Pending Verification", "Pending Verification")]
+
+
+def leaderboard_parts(df: pd.DataFrame, filters: dict, duplicate_rolls=None) -> dict:
+    """
+    Sheet name -> rows of df for /export (possibly empty). Filters only narrow the
+    Leaderboard sheet. duplicate_rolls is the set of roll numbers held by more than
+    one student in the whole collection; by default it is taken from df alone.
+    """
+    kind = df["profile_status"]
+    ranked = kind.isin(RANKED_STATUSES)
+    public = ranked & filter_mask(df, filters)
+    private = kind.isin([PRIVATE, PENDING])
+    invalid_format = kind == INVALID_FORMAT
+    not_found = kind == NOT_FOUND
+
+    status = pd.Series(
+        np.select([invalid_format, private, not_found],
+                  ["Invalid URL Format", "Private Profile", "Invalid/Not Found"], "Public"),
+        index=df.index
+    )
+    rows = _leaderboard_rows(df, ranked, status)
+
+    if duplicate_rolls is None:
+        duplicated = df["roll_number"].duplicated(keep=False)
+    else:
+        duplicated = df["roll_number"].isin(duplicate_rolls)
+    # Filtered-out public rows are left off every sheet, including Duplicates
+    duplicates = duplicated & ~(ranked & ~public)
+
+    return {
+        "Leaderboard": rows[public],
+        "Private Profiles": rows[private],
+        "Invalid URLs": rows[invalid_format | not_found],
+        DUPLICATES_SHEET: rows[duplicates].assign(Duplicate_Issue="Duplicate Roll Number"),
+    }
+
+
+def leaderboard_sheets(df: pd.DataFrame, filters: dict) -> list:
+    """(sheet name, DataFrame) pairs for /export, from one frame of every student."""
+    parts = leaderboard_parts(df, filters)
+    sheets = [(name, _or_message(parts[name], message)) for name, message in LEADERBOARD_SHEETS]
+    if not parts[DUPLICATES_SHEET].empty:
+        sheets.append((DUPLICATES_SHEET, parts[DUPLICATES_SHEET]))
+    return sheets
+
+
+def admin_table(df: pd.DataFrame) -> pd.DataFrame:
+    """The All Students sheet; `df` must already be in roll number order (as the admin exports query it)."""
+    return pd.DataFrame({
+        "Roll Number": df["roll_number"],
+        "Name": df["name"],
+        "Profile URL": df["profile_url"],
+        "Points": df["points"],
+        "Badges": df["badges"],
+        "Certifications": df["certifications_text"],
+        "Champion 2026": np.where(df["is_champion"], "✓", ""),
+        "Innovator 2026": np.where(df["is_innovator"], "✓", ""),
+        "Legend 2026": np.where(df["is_legend"], "✓", ""),
+        "Current Module": df["agentblazer_tier"].map(CURRENT_MODULE_LABELS).fillna("Not Started"),
+        "Status": df["profile_status"].map(ADMIN_STATUS_LABELS).fillna("Error"),
+        "Error Details": df["error_details"],
+    }, columns=ADMIN_COLUMNS)
+
+
+def admin_parts(df: pd.DataFrame) -> dict:
+    """Sheet name -> rows of df for /admin/export (possibly empty); `df` must be in roll number order."""
+    rows = admin_table(df)
+    parts = {"All Students": rows}
+    for label, sheet in ADMIN_SUBSETS:
+        parts[sheet] = rows[rows["Status"] == label]
+    return parts
+
+
+def admin_sheets(df: pd.DataFrame) -> list:
+    """(sheet name, DataFrame) pairs for /admin/export; `df` must be in roll number order."""
+    return [(name, rows) for name, rows in admin_parts(df).items()
+            if name == "All Students" or not rows.empty]
+
+
+def admin_sheet_names(status_counts: dict) -> list:
+    """The /admin/export sheets, in order, given student counts per profile_status."""
+    labels = {ADMIN_STATUS_LABELS.get(status, "Error") for status, count in status_counts.items() if count}
+    return ["All Students"] + [sheet for label, sheet in ADMIN_SUBSETS if label in labels]
+
+
+def write_xlsx(sheets: list, target):
+    """
+    Writes (sheet name, DataFrame) pairs as one workbook to a path or file object.
+    Constant-memory mode flushes each row as it is written, so the writer
+    never holds more than one row of cells per sheet.
+    """
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": True, "nan_inf_to_errors": True})
+    for name, frame in sheets:
+        worksheet = workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, list(frame.columns))
+        for row, values in enumerate(frame.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row, 0, values)
+    workbook.close()
+
+
+def write_xlsx_stream(batches, target, sheets: list, optional: tuple = ()):
+    """
+    Writes one workbook a batch at a time, so memory is bounded by the batch size.
+    `sheets` are (name, message) pairs added up front in that order; one that gets no
+    rows holds `message` instead (if any). Sheets named in `optional` are added after
+    them once they get a row. `batches` yields dicts of sheet name -> rows to append.
+    """
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": True, "nan_inf_to_errors": True})
+    worksheets = {name: workbook.add_worksheet(name) for name, _ in sheets}
+    next_row = {}
+    for batch in batches:
+        for name, frame in batch.items():
+            if frame.empty:
+                continue
+            if name not in worksheets:
+                if name not in optional:
+                    logger.warning(f"Dropped {len(frame)} rows for sheet {name!r}, which this workbook doesn't have")
+                    continue
+                worksheets[name] = workbook.add_worksheet(name)
+            worksheet = worksheets[name]
+            row = next_row.get(name)
+            if row is None:
+                worksheet.write_row(0, 0, list(frame.columns))
+                row = 1
+            # Constant-memory mode flushes each row; sheets only need their own rows in order
+            for values in frame.itertuples(index=False, name=None):
+                worksheet.write_row(row, 0, values)
+                row += 1
+            next_row[name] = row
+    for name, message in sheets:
+        if name not in next_row and message:
+            worksheets[name].write_row(0, 0, ["Message"])
+            worksheets[name].write_row(1, 0, [message])
+    workbook.close()
+
+
+def _ranked_frames(batches):
+    """load_frame() per Mongo batch in leaderboard order, with ranks carried across batches."""
+    first_rank, previous = 1, None
+    for batch in batches:
+        df = load_frame(batch, first_rank, previous)
+        if len(df):
+            last = df.iloc[-1]
+            previous = (last["points"], last["badges"], last["rank"])
+        yield df
+        first_rank += len(batch)
+
+
+def leaderboard_batches(batches, filters: dict):
+    """Leaderboard rows per Mongo batch; `batches` must come in leaderboard order."""
+    for df in _ranked_frames(batches):
+        yield leaderboard_table(df, filters)
+
+
+def leaderboard_sheet_batches(batches, filters: dict, duplicate_rolls: set):
+    """leaderboard_parts() per Mongo batch, for write_xlsx_stream(); `batches` in leaderboard order."""
+    for df in _ranked_frames(batches):
+        yield leaderboard_parts(df, filters, duplicate_rolls)
+
+
+def admin_batches(batches):
+    """All Students rows per Mongo batch; `batches` must come in roll number order."""
+    for batch in batches:
+        yield admin_table(load_frame(batch))
+
+
+def admin_sheet_batches(batches):
+    """admin_parts() per Mongo batch, for write_xlsx_stream(); `batches` in roll number order."""
+    for batch in batches:
+        yield admin_parts(load_frame(batch))
+
+
+def iter_csv(frames, columns: list):
+    """Encodes frames as one CSV document, a batch at a time."""
+    header = True
+    for frame in frames:
+        if frame.empty:
+            continue
+        yield frame.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+    if header:
+        yield (",".join(columns) + "\n").encode("utf-8")
+
+
+def write_parquet(frames, target, columns: list):
+    """Writes frames as row groups of one Parquet file."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    for frame in frames:
+        if frame.empty:
+            continue
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(target, table.schema)
+        writer.write_table(table.cast(writer.schema))
+    if writer is None:
+        pq.write_table(pa.Table.from_pandas(pd.DataFrame(columns=columns), preserve_index=False), target)
+    else:
+        writer.close()
+
+
+def iter_file(file, chunk_size: int = STREAM_CHUNK_BYTES):
+    """Streams a file from the start in chunks, closing it afterwards."""
+    try:
+        file.seek(0)
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
@@ -0,0 +1,239 @@
+"""
+Builds export files off the event loop and caches them on disk.
+
+Files are keyed by (data version, export kind, format, normalized filters), so a
+repeated download with the same filters is served from the cache until the data
+changes. The cache is an LRU bounded by total bytes and entry count.
+"""
+import os
+import shutil
+import asyncio
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from repository import students_repo, run_db, read_data_version, KEYSET_SORT
+from export_engine import (EXPORT_PROJECTION, EXPORT_BATCH_ROWS, LEADERBOARD_COLUMNS, ADMIN_COLUMNS,
+                           LEADERBOARD_SHEETS, DUPLICATES_SHEET, ADMIN_SUBSETS, admin_sheet_names, leaderboard_batches,
+                           admin_batches, leaderboard_sheet_batches, admin_sheet_batches,
+                           write_xlsx_stream, iter_csv, write_parquet, iter_file)
+
+logger = logging.getLogger(__name__)
+
+# Exports are CPU-heavy pandas/xlsxwriter work; keep them off the Mongo I/O pool too
+EXPORT_THREADS = int(os.getenv("EXPORT_THREADS", "2"))
+export_executor = ThreadPoolExecutor(max_workers=EXPORT_THREADS, thread_name_prefix="export")
+
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_MB", "256")) * 1024 * 1024
+EXPORT_CACHE_MAX_ENTRIES = int(os.getenv("EXPORT_CACHE_MAX_ENTRIES", "32"))
+
+
+def _write_table(frames, columns: list, format: str, path: str):
+    if format == "csv":
+        with open(path, "wb") as f:
+            for chunk in iter_csv(frames, columns):
+                f.write(chunk)
+    else:
+        write_parquet(frames, path, columns)
+
+
+def build_leaderboard_export(format: str, filters: dict, path: str):
+    """
+    Writes the /export file a Mongo batch at a time. Blocking: runs on export_executor.
+    The Duplicates sheet comes from one aggregation up front instead of the whole cohort.
+    """
+    if format == "xlsx":
+        duplicates = students_repo.duplicate_values("roll_number")
+        batches = students_repo.scan_batches({}, EXPORT_PROJECTION, KEYSET_SORT, EXPORT_BATCH_ROWS)
+        write_xlsx_stream(leaderboard_sheet_batches(batches, filters, duplicates), path,
+                          LEADERBOARD_SHEETS, optional=(DUPLICATES_SHEET,))
+        return
+    batches = students_repo.scan_batches({}, EXPORT_PROJECTION, KEYSET_SORT, EXPORT_BATCH_ROWS)
+    _write_table(leaderboard_batches(batches, filters), LEADERBOARD_COLUMNS, format, path)
+
+
+def build_admin_export(format: str, path: str):
+    """
+    Writes the /admin/export file a Mongo batch at a time. Blocking: runs on export_executor.
+    The per-status sheets are laid out from one count per profile_status up front;
+    a status that only shows up during the scan still gets its sheet, appended at the end.
+    """
+    batches = students_repo.scan_batches({}, EXPORT_PROJECTION, [("roll_number", 1)], EXPORT_BATCH_ROWS)
+    if format == "xlsx":
+        sheets = [(name, None) for name in admin_sheet_names(students_repo.count_by("profile_status"))]
+        write_xlsx_stream(admin_sheet_batches(batches), path, sheets,
+                          optional=tuple(sheet for _, sheet in ADMIN_SUBSETS))
+        return
+    _write_table(admin_batches(batches), ADMIN_COLUMNS, format, path)
+
+
+class CachedExport:
+    """A generated export file on disk; evicted files are unlinked once no response holds them."""
+
+    def __init__(self, key: tuple, path: str):
+        self.key = key
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.readers = 0
+        self.evicted = False
+
+
+class ExportCache:
+    """
+    LRU of generated export files. Concurrent requests for the same key share
+    one build; entries from older data versions are dropped as soon as a newer
+    version is built. Every entry get() returns is held for its caller until
+    release() (see stream()), so eviction can't unlink a file about to be served.
+    """
+
+    def __init__(self, max_bytes: int = EXPORT_CACHE_MAX_BYTES, max_entries: int = EXPORT_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.building = {}
+        self.waiting = {}  # key -> requests awaiting its build, each owed a reference
+        # release() runs on the streaming thread; reference counts are shared with the loop
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.directory = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: tuple, build):
+        """
+        Returns (CachedExport, hit) with a reference held for the caller. `key`
+        starts with the data version; `build(path)` writes the file and runs on
+        export_executor.
+        """
+        entry = self.entries.get(key)
+        if entry:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            with self.lock:
+                entry.readers += 1
+            return entry, True
+
+        task = self.building.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._build(key, build))
+            self.building[key] = task
+            task.add_done_callback(lambda _: self.building.pop(key, None))
+        self.waiting[key] = self.waiting.get(key, 0) + 1
+        try:
+            # A cancelled request must not cancel the build other requests are waiting on
+            return await asyncio.shield(task), False
+        except asyncio.CancelledError:
+            if not task.done():
+                self.waiting[key] -= 1
+            elif not task.cancelled() and task.exception() is None:
+                self.release(task.result())
+            raise
+
+    async def _build(self, key: tuple, build) -> CachedExport:
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="exports-")
+        fd, path = tempfile.mkstemp(dir=self.directory)
+        os.close(fd)
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(export_executor, build, path)
+        except Exception:
+            self.waiting.pop(key, None)
+            os.remove(path)
+            raise
+
+        entry = CachedExport(key, path)
+        # Taken before any other coroutine runs, so a newer build can't unlink it first
+        entry.readers = self.waiting.pop(key, 0)
+        version = key[0]
+        for stale in [k for k in self.entries if k[0] < version]:
+            self._remove(stale)
+        self.entries[key] = entry
+        self.total_bytes += entry.size
+        while len(self.entries) > 1 and (self.total_bytes > self.max_bytes or len(self.entries) > self.max_entries):
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+        logger.info(f"Built export {key[1:3]} v{version} ({entry.size} bytes)")
+        return entry
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry.size
+        with self.lock:
+            entry.evicted = True
+            held = entry.readers > 0
+        if not held:
+            self._unlink(entry)
+
+    def release(self, entry: CachedExport):
+        """Drops a reference taken by get(); the last one unlinks an evicted file."""
+        with self.lock:
+            entry.readers -= 1
+            unlink = entry.evicted and entry.readers == 0
+        if unlink:
+            self._unlink(entry)
+
+    @staticmethod
+    def _unlink(entry: CachedExport):
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+    async def stream(self, entry: CachedExport):
+        """
+        Opens an entry from get() off the event loop and returns an iterator over its
+        bytes that releases the reference once the response has been streamed.
+        """
+        try:
+            file = await asyncio.to_thread(open, entry.path, "rb")
+        except BaseException:
+            self.release(entry)
+            raise
+        return self._chunks(file, entry)
+
+    def _chunks(self, file, entry: CachedExport):
+        try:
+            yield from iter_file(file)
+        finally:
+            self.release(entry)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "building": len(self.building)
+        }
+
+    def close(self):
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self.entries.clear()
+        self.total_bytes = 0
+        self.directory = None
+
+
+export_cache = ExportCache()
+
+
+async def leaderboard_export(format: str, filters: dict):
+    """The /export file for these normalized filters, from cache when the data hasn't changed."""
+    version = await run_db(read_data_version)
+    key = (version, "leaderboard", format, tuple(sorted(filters.items())))
+    return await export_cache.get(key, partial(build_leaderboard_export, format, filters))
+
+
+async def admin_export(format: str):
+    version = await run_db(read_data_version)
+    return await export_cache.get((version, "admin", format), partial(build_admin_export, format))
@@ -6,13 +6,14 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from database import students_collection
+from repository import PUBLIC_PROJECTION
+from ranking import assign_ranks
 
 # Fetch all students from MongoDB
-students = list(students_collection.find({}, {"_id": 0}).sort([("points", -1), ("badges", -1)]))
+students = list(students_collection.find({}, PUBLIC_PROJECTION).sort([("points", -1), ("badges", -1)]))
 
-# Add rank
-for idx, s in enumerate(students):
-    s["rank"] = idx + 1
+# Add rank (ties share one)
+assign_ranks(students)
 
 # Determine output path relative to this script
 script_dir = os.path.dirname(os.path.abspath(__file__))
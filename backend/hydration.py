@@ -0,0 +1,139 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Ceiling for the readiness wait and how long tallies must hold still to count as hydrated
+HYDRATION_TIMEOUT_MS = int(os.getenv("SCRAPE_HYDRATION_TIMEOUT_MS", "15000"))
+HYDRATION_STABLE_MS = int(os.getenv("SCRAPE_HYDRATION_STABLE_MS", "400"))
+
+# Runs inside the page. Watches the light DOM and every shadow root with
+# MutationObservers and resolves as soon as the tally counts stop changing,
+# or early when the page turns out to be private / not found.
+READY_SCRIPT = """
+([stableMs, timeoutMs]) => new Promise((resolve) => {
+    const start = performance.now();
+    const observed = new WeakSet();
+    const observers = [];
+    let lastKey = null;
+    let lastChange = start;
+    let done = false;
+    let scheduled = false;
+
+    const shadowRoots = (root, out) => {
+        root.querySelectorAll('*').forEach((el) => {
+            if (el.shadowRoot) {
+                out.push(el.shadowRoot);
+                shadowRoots(el.shadowRoot, out);
+            }
+        });
+        return out;
+    };
+
+    const readCounts = (roots) => {
+        const counts = [];
+        roots.forEach((root) => {
+            root.querySelectorAll('lwc-tbui-tally').forEach((tally) => {
+                const scope = tally.shadowRoot || tally;
+                scope.querySelectorAll('.tally__count').forEach((el) => counts.push(el.innerText || el.textContent || ''));
+            });
+        });
+        return counts;
+    };
+
+    const finish = (state, counts) => {
+        if (done) return;
+        done = true;
+        observers.forEach((o) => o.disconnect());
+        clearInterval(ticker);
+        clearTimeout(ceiling);
+        resolve({ state, counts, elapsed: Math.round(performance.now() - start) });
+    };
+
+    const observe = (root) => {
+        if (observed.has(root)) return;
+        observed.add(root);
+        const observer = new MutationObserver(schedule);
+        observer.observe(root, { childList: true, subtree: true, characterData: true });
+        observers.push(observer);
+    };
+
+    const check = () => {
+        scheduled = false;
+        if (done) return;
+        const html = document.documentElement ? document.documentElement.innerHTML : '';
+        if (html.includes('This user has chosen to keep their profile private')) return finish('private', []);
+        if (html.includes("We can't find that page") || html.includes('Page Not Found')) return finish('not_found', []);
+
+        const roots = [document, ...shadowRoots(document, [])];
+        roots.forEach(observe);
+
+        const counts = readCounts(roots);
+        const nums = counts.map((t) => parseInt(t.replace(/[,+]/g, '').trim(), 10)).filter((n) => !isNaN(n));
+        const key = nums.join('|');
+        const now = performance.now();
+        if (key !== lastKey) {
+            lastKey = key;
+            lastChange = now;
+            return;
+        }
+        const quiet = now - lastChange;
+        if (nums.length > 0 && Math.max(...nums) > 0 && quiet >= stableMs) return finish('ready', counts);
+        // Zero tallies that never move are a settled (likely private) profile, not a slow one
+        if (nums.length > 0 && quiet >= stableMs * 4) return finish('ready', counts);
+    };
+
+    function schedule() {
+        if (scheduled || done) return;
+        scheduled = true;
+        setTimeout(check, 50);
+    }
+
+    // Mutations drive the check; the ticker only confirms the quiet period has elapsed
+    const ticker = setInterval(schedule, Math.max(100, Math.floor(stableMs / 2)));
+    const ceiling = setTimeout(() => finish('timeout', readCounts([document, ...shadowRoots(document, [])])), timeoutMs);
+    check();
+})
+"""
+
+
+class PhaseTimer:
+    """Records how long each phase of a scrape took, in milliseconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - phase_start) * 1000)
+
+    def as_dict(self):
+        timings = dict(self.timings)
+        timings["total"] = round((time.perf_counter() - self.started) * 1000)
+        return timings
+
+
+async def wait_for_profile_ready(page, timeout_ms: int = HYDRATION_TIMEOUT_MS, stable_ms: int = HYDRATION_STABLE_MS):
+    """
+    Waits until the profile's tally counts are rendered and stable.
+    Returns a dict with 'state' ('ready', 'private', 'not_found', 'timeout' or 'error'),
+    the raw 'counts' texts and the 'elapsed' milliseconds spent in the page.
+    """
+    for attempt in range(2):
+        try:
+            return await page.evaluate(READY_SCRIPT, [stable_ms, timeout_ms])
+        except Exception as e:
+            # A client-side redirect destroys the execution context; wait for the new document once
+            logger.info(f"Readiness check interrupted (attempt {attempt + 1}): {e}")
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+            except Exception:
+                break
+    return {"state": "error", "counts": [], "elapsed": 0}
@@ -0,0 +1,156 @@
+"""
+Index bootstrap and query-plan checks.
+
+Usage:
+    python indexes.py    # create/verify indexes, then explain() every hot query; exits 1 on COLLSCAN
+"""
+import os
+import sys
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from database import students_collection, scrape_jobs_collection
+from job_queue import ensure_queue_indexes, QUEUED, LEASED
+
+logger = logging.getLogger(__name__)
+
+# Raise at API startup (instead of only logging) when a hot query loses its index
+STRICT_QUERY_PLANS = os.getenv("STRICT_QUERY_PLANS", "0") == "1"
+
+# Backs keyset pagination over the leaderboard order, and the plain (points, badges) sort as its prefix
+LEADERBOARD_KEYSET_INDEX = [("points", DESCENDING), ("badges", DESCENDING), ("roll_number", ASCENDING)]
+
+STUDENT_INDEXES = [
+    # force_scrape lookups, upload upserts, scrape result writes, admin export order
+    {"keys": [("roll_number", ASCENDING)], "name": "roll_number_unique", "unique": True},
+    # /students, /export, export_static_data.py sort and /students/page
+    {"keys": LEADERBOARD_KEYSET_INDEX, "name": "leaderboard_keyset"},
+    # /students/search: public students in leaderboard order, and name/roll substring trigrams
+    {"keys": [("is_public", ASCENDING)] + LEADERBOARD_KEYSET_INDEX, "name": "public_leaderboard"},
+    {"keys": [("search_grams", ASCENDING)], "name": "search_grams"},
+    # Typed status and tier written at scrape time, filtered on by exports and queries
+    {"keys": [("profile_status", ASCENDING)], "name": "profile_status"},
+    {"keys": [("agentblazer_tier", ASCENDING)], "name": "agentblazer_tier"},
+    # Scrape results fan out to every student listed under the same canonical profile
+    {"keys": [("profile_id", ASCENDING)], "name": "profile_id"},
+]
+
+
+class QueryPlanError(RuntimeError):
+    """A hot query would run as a collection scan."""
+
+
+# IndexOptionsConflict / IndexKeySpecsConflict: an index on these keys exists with other options
+INDEX_CONFLICT_CODES = (85, 86)
+
+
+def _create(collection, spec):
+    options = {k: v for k, v in spec.items() if k != "keys"}
+    if spec.get("unique"):
+        fallback = next((name for name, info in collection.index_information().items()
+                         if info["key"] == list(spec["keys"]) and not info.get("unique")), None)
+        if fallback:
+            # Left by an earlier boot that hit duplicates; drop it once they are cleaned up to go unique
+            logger.warning(f"Index {spec['name']} is still the non-unique {fallback}; duplicate values exist")
+            return
+    try:
+        collection.create_index(spec["keys"], **options)
+    except OperationFailure as e:
+        if e.code in INDEX_CONFLICT_CODES:
+            logger.warning(f"Keeping the existing index on {spec['keys']} in place of {spec['name']}: {e}")
+            return
+        if not spec.get("unique") or e.code != 11000:
+            raise
+        # Existing duplicate roll numbers block the unique index; keep lookups indexed anyway
+        logger.error(f"Cannot create unique index {spec['name']} - duplicate values exist: {e}")
+        collection.create_index(spec["keys"], name=spec["name"].replace("_unique", ""))
+
+
+def ensure_indexes():
+    """Creates the indexes the API's queries rely on and verifies they exist. Safe to run on every startup."""
+    for spec in STUDENT_INDEXES:
+        _create(students_collection, spec)
+    ensure_queue_indexes()
+
+    existing = {tuple(info["key"]) for info in students_collection.index_information().values()}
+    for spec in STUDENT_INDEXES:
+        if tuple(spec["keys"]) not in existing:
+            logger.error(f"Index {spec['name']} is missing on students")
+
+
+def hot_queries():
+    """(name, cursor) pairs for every query the API runs on a hot path."""
+    sample_key = {"points": 1000, "badges": 10, "roll_number": "0"}
+    return [
+        ("student by roll number", students_collection.find({"roll_number": "0"})),
+        ("leaderboard sort", students_collection.find({}, {"_id": 0}).sort([("points", -1), ("badges", -1)])),
+        ("admin export sort", students_collection.find({}, {"_id": 0}).sort([("roll_number", 1)])),
+        ("leaderboard page", students_collection.find({"$or": [
+            {"points": {"$lt": sample_key["points"]}},
+            {"points": sample_key["points"], "badges": {"$lt": sample_key["badges"]}},
+            {"points": sample_key["points"], "badges": sample_key["badges"], "roll_number": {"$gt": sample_key["roll_number"]}}
+        ]}).sort(LEADERBOARD_KEYSET_INDEX).limit(50)),
+        ("search by public flag", students_collection.find({"is_public": True}).sort(LEADERBOARD_KEYSET_INDEX)),
+        ("search by name", students_collection.find({"is_public": True, "search_grams": {"$all": ["abc"]}})),
+        ("students by profile status", students_collection.find({"profile_status": "private"})),
+        ("students by profile id", students_collection.find({"profile_id": "abc"}, {"_id": 0, "roll_number": 1})),
+        ("scrape job claim", scrape_jobs_collection.find({"$or": [
+            {"status": QUEUED, "available_at": {"$lte": 0}},
+            {"status": LEASED, "lease_expires": {"$lte": 0}}
+        ]}).sort([("priority", DESCENDING), ("available_at", ASCENDING)]).limit(1)),
+    ]
+
+
+def _stages(plan):
+    """Yields every stage name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def check_query_plans() -> dict:
+    """
+    Runs explain() on each hot query. Returns {name: [stages]} and raises
+    QueryPlanError if any winning plan contains a COLLSCAN.
+    """
+    plans = {}
+    failures = []
+    for name, cursor in hot_queries():
+        winning = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_stages(winning))
+        plans[name] = stages
+        if "COLLSCAN" in stages:
+            failures.append(name)
+        logger.info(f"Query plan for {name}: {' <- '.join(stages)}")
+    if failures:
+        raise QueryPlanError(f"Collection scan in hot queries: {', '.join(failures)}")
+    return plans
+
+
+def bootstrap(strict: bool = STRICT_QUERY_PLANS):
+    """Startup hook: ensure indexes, then check plans (raising only when strict)."""
+    ensure_indexes()
+    try:
+        check_query_plans()
+    except QueryPlanError as e:
+        if strict:
+            raise
+        logger.error(str(e))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ensure_indexes()
+    try:
+        for query, stages in check_query_plans().items():
+            print(f"✅ {query}: {' <- '.join(stages)}")
+    except QueryPlanError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,176 @@
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import scrape_jobs_collection, students_collection
+from repository import bump_data_version
+from student_fields import with_derived
+from profile_status import TRANSIENT_ERROR
+
+logger = logging.getLogger(__name__)
+
+# How long a worker owns a claimed job before another worker may take it over
+LEASE_SECONDS = int(os.getenv("SCRAPE_JOB_LEASE_S", "300"))
+MAX_ATTEMPTS = int(os.getenv("SCRAPE_JOB_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = 60
+# Finished jobs are kept this long for inspection, then expire
+KEEP_DONE_SECONDS = 24 * 3600
+
+# Higher runs first
+PRIORITY_MANUAL = 10
+PRIORITY_UPLOAD = 5
+PRIORITY_REFRESH = 0
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def ensure_queue_indexes():
+    """Creates the indexes the claim query and per-student dedupe rely on."""
+    scrape_jobs_collection.create_index(
+        [("status", ASCENDING), ("priority", DESCENDING), ("available_at", ASCENDING)],
+        name="claim_order"
+    )
+    scrape_jobs_collection.create_index(
+        [("status", ASCENDING), ("lease_expires", ASCENDING)],
+        name="expired_leases"
+    )
+    # At most one waiting job per student; re-enqueueing just bumps it
+    scrape_jobs_collection.create_index(
+        [("roll_number", ASCENDING)],
+        name="one_queued_job_per_student",
+        unique=True,
+        partialFilterExpression={"status": QUEUED}
+    )
+    scrape_jobs_collection.create_index(
+        [("finished_at", ASCENDING)],
+        name="expire_finished",
+        expireAfterSeconds=KEEP_DONE_SECONDS
+    )
+
+
+def _enqueue_op(roll_number: str, url: str, priority: int, now, force: bool = False):
+    # force sticks once set: a waiting forced job stays forced when re-enqueued
+    fields = {"profile_url": url, "force": True} if force else {"profile_url": url}
+    return UpdateOne(
+        {"roll_number": roll_number, "status": QUEUED},
+        {
+            "$set": fields,
+            "$max": {"priority": priority},
+            "$setOnInsert": {"attempts": 0, "available_at": now, "created_at": now}
+        },
+        upsert=True
+    )
+
+
+def enqueue_scrape(roll_number: str, url: str, priority: int = PRIORITY_MANUAL, force: bool = False):
+    """
+    Queues one scrape, merging with a job that is already waiting for this student.
+    force makes the worker skip the scrape result cache.
+    """
+    enqueue_many([(roll_number, url)], priority, force=force)
+
+
+def enqueue_many(items, priority: int = PRIORITY_REFRESH, force: bool = False) -> int:
+    """Queues (roll_number, url) pairs in one bulk write. Returns how many were queued."""
+    now = _now()
+    ops = [_enqueue_op(roll, url, priority, now, force) for roll, url in items]
+    if not ops:
+        return 0
+    try:
+        scrape_jobs_collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Two enqueues racing for the same student both upsert; the loser is already queued
+        other = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+        if other:
+            raise
+    return len(ops)
+
+
+def claim_batch(worker_id: str, size: int) -> list:
+    """
+    Leases up to `size` jobs for this worker, highest priority first.
+    Jobs whose lease expired (crashed or stuck worker) are claimable again.
+    """
+    jobs = []
+    for _ in range(size):
+        now = _now()
+        job = scrape_jobs_collection.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED, "available_at": {"$lte": now}},
+                {"status": LEASED, "lease_expires": {"$lte": now}}
+            ]},
+            {
+                "$set": {
+                    "status": LEASED,
+                    "lease_owner": worker_id,
+                    "lease_expires": now + timedelta(seconds=LEASE_SECONDS)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", DESCENDING), ("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if not job:
+            break
+        if job["attempts"] > MAX_ATTEMPTS:
+            fail(job, "Gave up after repeated lease expiry")
+            students_collection.update_one(
+                {"roll_number": job["roll_number"]},
+                with_derived({"is_scraping": False, "scrape_error": "Scrape timed out repeatedly",
+                              "profile_status": TRANSIENT_ERROR})
+            )
+            bump_data_version()
+            continue
+        jobs.append(job)
+    return jobs
+
+
+def complete_op(job) -> UpdateOne:
+    """The write that marks a leased job as done, for batching through a bulk write."""
+    return UpdateOne(
+        {"_id": job["_id"], "lease_owner": job.get("lease_owner")},
+        {"$set": {"status": DONE, "finished_at": _now()}, "$unset": {"lease_expires": ""}}
+    )
+
+
+def fail(job, error: str) -> bool:
+    """
+    Records a failed attempt. Requeues the job with a delay until MAX_ATTEMPTS,
+    then parks it as failed. Returns True if the job will be retried.
+    """
+    now = _now()
+    retry = job.get("attempts", 0) < MAX_ATTEMPTS
+    update = {"last_error": error}
+    if retry:
+        update.update({"status": QUEUED, "available_at": now + timedelta(seconds=RETRY_DELAY_SECONDS * job.get("attempts", 1))})
+    else:
+        update.update({"status": FAILED, "finished_at": now})
+    try:
+        scrape_jobs_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": update, "$unset": {"lease_owner": "", "lease_expires": ""}}
+        )
+    except Exception as e:
+        # Requeueing can collide with a newer queued job for the same student; that one wins
+        logger.info(f"Dropping retry of job {job['_id']}: {e}")
+        scrape_jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"status": FAILED, "finished_at": now}})
+        retry = False
+    return retry
+
+
+def queue_stats() -> dict:
+    """Job counts by status."""
+    counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+    for row in scrape_jobs_collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return counts
@@ -0,0 +1,66 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+from repository import students_repo, run_db, read_data_version
+from ranking import assign_ranks
+
+logger = logging.getLogger(__name__)
+
+# How often a request may trigger the (single-document) data version check
+VERSION_CHECK_SECONDS = float(os.getenv("LEADERBOARD_VERSION_CHECK_S", "1.0"))
+
+
+class LeaderboardSnapshot:
+    """A ranked leaderboard serialized once, tagged with the data version it was built from."""
+
+    def __init__(self, version: int, students: list):
+        self.version = version
+        self.students = students
+        self.body = json.dumps(students, default=str, ensure_ascii=False).encode("utf-8")
+        self.etag = f'"lb-{version}"'
+        self.built_at = time.time()
+
+
+class LeaderboardCache:
+    """
+    In-process cache of the /students payload.
+    A request costs at most one lookup of the data version document per
+    VERSION_CHECK_SECONDS; the full sorted query runs only when the version moved.
+    """
+
+    def __init__(self, check_interval: float = VERSION_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self.snapshot = None
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Forces a version check on the next request (use after writes in this process)."""
+        self.checked_at = 0.0
+
+    async def get(self) -> LeaderboardSnapshot:
+        if self.snapshot and time.monotonic() - self.checked_at < self.check_interval:
+            return self.snapshot
+
+        async with self.lock:
+            # Another request may have refreshed while we waited
+            if self.snapshot and time.monotonic() - self.checked_at < self.check_interval:
+                return self.snapshot
+
+            version = await run_db(read_data_version)
+            self.checked_at = time.monotonic()
+            if self.snapshot and self.snapshot.version == version:
+                return self.snapshot
+
+            students = await students_repo.leaderboard()
+            # Ties share a rank, as on every other endpoint
+            assign_ranks(students)
+            self.snapshot = LeaderboardSnapshot(version, students)
+            logger.info(f"Rebuilt leaderboard snapshot v{version} ({len(students)} students, {len(self.snapshot.body)} bytes)")
+            return self.snapshot
+
+
+leaderboard_cache = LeaderboardCache()
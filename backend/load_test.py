@@ -0,0 +1,98 @@
+"""
+Measures GET /students latency before and during a large scrape.
+
+Usage:
+    python load_test.py                          # against http://localhost:8000
+    python load_test.py --seed 1000              # first upload a 1,000-row synthetic roster
+    python load_test.py --base-url http://host:8000 --clients 20 --duration 120
+
+It records a baseline window, then triggers POST /scrape-all?full=true and keeps polling
+while the scrape runs, printing p50/p95/p99 per window. With the async data layer the
+p99 during the scrape should stay close to the baseline.
+"""
+import io
+import time
+import asyncio
+import argparse
+import statistics
+
+import httpx
+import pandas as pd
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, samples, errors):
+    print(f"{label:>10}: n={len(samples):5d} errors={errors:3d} "
+          f"p50={percentile(samples, 50):7.1f}ms p95={percentile(samples, 95):7.1f}ms "
+          f"p99={percentile(samples, 99):7.1f}ms mean={statistics.mean(samples) if samples else 0:7.1f}ms")
+
+
+async def seed_roster(client, count):
+    rows = [{
+        "Roll Number": f"LOADTEST{i:05d}",
+        "Name": f"Load Test {i}",
+        "Profile URL": f"https://www.salesforce.com/trailblazer/loadtest{i:08d}"
+    } for i in range(count)]
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    files = {"file": ("loadtest.xlsx", buffer.getvalue(),
+                      "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    response = await client.post("/upload", files=files, timeout=300)
+    response.raise_for_status()
+    print(f"Seeded roster: {response.json()}")
+
+
+async def poll_window(client, clients, seconds):
+    samples = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def poller():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get("/students", timeout=30)
+                response.raise_for_status()
+                samples.append((time.perf_counter() - started) * 1000)
+            except httpx.HTTPError:
+                errors += 1
+
+    await asyncio.gather(*(poller() for _ in range(clients)))
+    return samples, errors
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url) as client:
+        if args.seed:
+            await seed_roster(client, args.seed)
+
+        samples, errors = await poll_window(client, args.clients, args.window)
+        summarize("baseline", samples, errors)
+
+        response = await client.post("/scrape-all", params={"full": "true"}, timeout=60)
+        print(f"Triggered scrape: {response.json()}")
+
+        windows = max(1, args.duration // args.window)
+        for i in range(windows):
+            samples, errors = await poll_window(client, args.clients, args.window)
+            queue = (await client.get("/admin/scrape-queue")).json().get("jobs", {})
+            summarize(f"t+{(i + 1) * args.window}s", samples, errors)
+            print(f"{'':>10}  queue: {queue}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GET /students latency under scrape load.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--seed", type=int, default=0, help="upload this many synthetic students first")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent pollers")
+    parser.add_argument("--window", type=int, default=10, help="seconds per reporting window")
+    parser.add_argument("--duration", type=int, default=120, help="seconds to measure during the scrape")
+    asyncio.run(main(parser.parse_args()))
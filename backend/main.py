@@ -1,9 +1,8 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException
+from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import pandas as pd
-import io
-import shutil
+import base64
 import asyncio
 from typing import List, Optional
 from dotenv import load_dotenv
@@ -22,8 +21,24 @@ logger = logging.getLogger(__name__)
 # Load environment variables from .env file (for local development)
 load_dotenv()
 
-from database import students_collection, settings_collection
+from repository import students_repo, settings_repo, run_db, PUBLIC_PROJECTION
+from leaderboard_cache import leaderboard_cache
+from rank_index import rank_index
+from ranking import assign_ranks
+from student_fields import backfill_derived_fields, normalize_filters, search_query, FACET_COUNTS
+from roster_ingest import ROSTER_FORMATS, RosterError, IngestReport, read_roster, ingest_chunk
+from export_engine import EXPORT_FORMATS, MEDIA_TYPES
+from export_service import export_cache, leaderboard_export, admin_export
+from indexes import bootstrap as bootstrap_indexes
 from scraper import scraper # Import the global scraper instance
+from refresh_policy import select_due_students, MAX_BATCH as REFRESH_MAX_BATCH
+from job_queue import (enqueue_scrape, enqueue_many, queue_stats,
+                       PRIORITY_UPLOAD, PRIORITY_REFRESH)
+from worker import run_worker, scrape_limiter
+from write_buffer import student_writes, job_writes, FLUSH_MAX_OPS as UPLOAD_BATCH_SIZE
+
+# Scrape results flushed by the embedded worker move students in the rank index without a rebuild
+student_writes.listeners.append(rank_index.note_local_write)
 
 app = FastAPI()
 
@@ -37,11 +52,7 @@ async def set_maintenance_mode(settings: MaintenanceSettings, background_tasks:
     Toggle maintenance mode, update local JSON, and push to Git for Vercel deploy.
     """
     # 1. Update MongoDB (local)
-    settings_collection.update_one(
-        {"_id": "maintenance"},
-        {"$set": {"enabled": settings.enabled, "message": settings.message}},
-        upsert=True
-    )
+    await settings_repo.set_maintenance(settings.enabled, settings.message)
 
     # 2. Update frontend JSON file
     file_path = os.path.join("..", "frontend", "src", "data", "maintenance.json")
@@ -73,24 +84,56 @@ async def get_maintenance_mode():
     """
     Get current maintenance status.
     """
-    settings = settings_collection.find_one({"_id": "maintenance"})
-    if settings:
-        return {"enabled": settings.get("enabled", False), "message": settings.get("message", "")}
-    return {"enabled": False, "message": ""}
+    return await settings_repo.get_maintenance()
+
 
+# Run a scrape worker inside the API process unless dedicated workers (worker.py) are deployed
+EMBEDDED_WORKER = os.getenv("EMBEDDED_SCRAPE_WORKER", "1") != "0"
+worker_stop = asyncio.Event()
+worker_task = None
 
-# Concurrency limit for scraping - balanced for reliability
-SCRAPE_SEMAPHORE = asyncio.Semaphore(5)  # Limit to 5 concurrent tabs for stability
+@app.get("/admin/scrape-concurrency")
+async def get_scrape_concurrency():
+    """
+    Current adaptive scrape concurrency limit of the embedded worker and its recent decisions.
+    """
+    return scrape_limiter.snapshot()
+
+@app.get("/admin/scrape-queue")
+async def get_scrape_queue():
+    """
+    Scrape job counts by status, the state of the write-behind buffers,
+    and how many scrapes this process shared between duplicate profiles.
+    """
+    return {
+        "jobs": await run_db(queue_stats),
+        "write_buffers": {"students": student_writes.stats(), "scrape_jobs": job_writes.stats()},
+        "scrape_dedupe": scraper.flights.snapshot()
+    }
 
 @app.on_event("startup")
 async def startup_event():
-    print("Starting up: Initializing browser...")
-    await scraper.start()
+    global worker_task
+    # Indexes for every hot query (queue included), checked with explain()
+    await run_db(bootstrap_indexes)
+    # Flags and search n-grams for students written before they were stored
+    await run_db(backfill_derived_fields)
+    if EMBEDDED_WORKER:
+        print("Starting up: Initializing browser and embedded scrape worker...")
+        await scraper.start()
+        worker_task = asyncio.create_task(run_worker(scraper, worker_stop))
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    print("Shutting down: Closing browser...")
-    await scraper.stop()
+    if worker_task:
+        print("Shutting down: Stopping worker and closing browser...")
+        worker_stop.set()
+        await worker_task
+        await scraper.stop()
+    # Anything still buffered must reach Mongo before exit
+    await student_writes.close()
+    await job_writes.close()
+    export_cache.close()
 
 # CORS configuration - updated for Vercel deployment
 origins = [
@@ -119,184 +162,240 @@ class Student(BaseModel):
     certifications: List[str] = []
     agentblazer_status: List[str] = []
 
-async def process_student_scrape(roll_number: str, url: str):
+@app.post("/upload")
+async def upload_file(file: UploadFile = File(...)):
     """
-    Async background task to scrape data and update DB.
-    Uses a semaphore to limit concurrent browser pages.
+    Upload an Excel (.xlsx/.xls) or CSV roster containing Roll Number and Profile URL.
+    The file is read and saved a chunk at a time; the response has a per-row validation report.
     """
-    async with SCRAPE_SEMAPHORE:
-        logger.info(f"🔄 Starting scrape for {roll_number} - URL: {url}")
+    if not file.filename.lower().endswith(ROSTER_FORMATS):
+        raise HTTPException(status_code=400, detail="Invalid file format. Please upload an Excel or CSV file.")
+
+    # Track duplicates but don't remove them - they'll be identified in the export
+    # Each upload will update existing records with the new data
+    report = IngestReport()
+    chunks = read_roster(file.file, file.filename)
+    queued = 0
+    write_errors = []
+    while True:
         try:
-            data = await scraper.scrape_profile(url)
-            
-            update_data = {
-                "points": data.get("points", 0),
-                "badges": data.get("badges", 0),
-                "certifications": data.get("certifications", []),
-                "agentblazer_status": data.get("agentblazer_status", []),
-                "last_updated": pd.Timestamp.now().isoformat(),
-                "is_scraping": False
-            }
-            
-            if "error" in data:
-                update_data["scrape_error"] = data["error"]
-                logger.warning(f"⚠️  Scrape error for {roll_number}: {data['error']}")
-            else:
-                update_data["scrape_error"] = None # Clear previous error
-                logger.info(f"✅ Successfully scraped {roll_number}: {data.get('points', 0)} points, {data.get('badges', 0)} badges")
-            
-            students_collection.update_one(
-                {"roll_number": roll_number},
-                {"$set": update_data}
-            )
-        except Exception as e:
-            logger.error(f"❌ Error processing scrape for {roll_number}: {e}")
-            students_collection.update_one(
-                {"roll_number": roll_number},
-                {"$set": {"is_scraping": False, "scrape_error": str(e)}}
-            )
+            # Parsing, validation, the diff lookup and building the writes are all
+            # per-chunk pandas/Python work; keep them off the event loop
+            ingested = await asyncio.to_thread(ingest_chunk, chunks, report)
+        except RosterError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if ingested is None:
+            break
+
+        ops, targets = ingested
+        for start in range(0, len(ops), UPLOAD_BATCH_SIZE):
+            result = await students_repo.bulk_write(ops[start:start + UPLOAD_BATCH_SIZE])
+            write_errors.extend(result["errors"])
+        # Queue scrapes only for new or re-pointed profiles; workers pick them up
+        queued += await run_db(enqueue_many, targets, PRIORITY_UPLOAD)
+
+    if write_errors:
+        logger.error(f"❌ {len(write_errors)} upload rows failed to save: {write_errors[:5]}")
+    leaderboard_cache.invalidate()
+
+    summary = report.summary()
+    return {
+        "message": f"Processing {queued} students in background ({summary['changes']['unchanged']} unchanged, "
+                   f"{summary['changes']['name_only']} renamed).",
+        "write_errors": len(write_errors),
+        **summary
+    }
 
-@app.post("/upload")
-async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+@app.get("/students")
+async def get_leaderboard(request: Request):
     """
-    Upload Excel file containing Roll Number and Profile URL.
+    Get sorted leaderboard.
+    Served from a versioned snapshot; clients sending a current If-None-Match get 304.
     """
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Invalid file format. Please upload Excel file.")
-
-    contents = await file.read()
+    snapshot = await leaderboard_cache.get()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    
+    if snapshot.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+# Fields a client may ask /students/page for; the sort keys are always included
+PAGE_FIELDS = {"roll_number", "name", "profile_url", "points", "badges", "certifications",
+               "agentblazer_status", "agentblazer_tier", "profile_status", "scrape_error", "is_scraping",
+               "last_updated"}
+PAGE_MAX_LIMIT = 500
+
+def encode_cursor(student: dict) -> str:
+    key = [student.get("points", 0), student.get("badges", 0), student.get("roll_number", "")]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def page_projection(fields: Optional[str]) -> dict:
+    """Projection for a comma-separated `fields` list (400 on unknown fields); the sort keys are always included."""
+    if not fields:
+        return PUBLIC_PROJECTION
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - PAGE_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    projection = {f: 1 for f in requested | {"roll_number", "points", "badges"}}
+    projection["_id"] = 0
+    return projection
+
+def decode_cursor(cursor: str):
     try:
-        df = pd.read_excel(io.BytesIO(contents))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Could not read Excel file: {str(e)}")
+        p, b, r = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # The values go straight into the keyset query; anything but plain scalars could be an operator
+    if not (type(p) is int and type(b) is int and isinstance(r, str)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return p, b, r
+
+@app.get("/students/page")
+async def get_leaderboard_page(limit: int = 50, cursor: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Keyset-paginated leaderboard ordered by points desc, badges desc, roll number.
+    `fields` is a comma-separated projection; ranks are absolute across pages.
+    Pass the returned next_cursor to get the following page.
+    """
+    limit = max(1, min(limit, PAGE_MAX_LIMIT))
+    projection = page_projection(fields)
 
-    # Normalize column names
-    df.columns = [c.strip().lower() for c in df.columns]
-    
-    # Check required columns. Flexible matching
-    roll_col = next((c for c in df.columns if 'roll' in c), None)
-    url_col = next((c for c in df.columns if 'url' in c or 'link' in c or 'profile' in c), None)
-    name_col = next((c for c in df.columns if 'name' in c), None) # Optional
+    after = decode_cursor(cursor) if cursor else None
+    students, first_position, first_rank = await students_repo.leaderboard_page(after, limit, projection)
+    assign_ranks(students, first_position, first_rank)
 
-    if not roll_col or not url_col:
-        raise HTTPException(status_code=400, detail="Excel must contain columns for 'Roll Number' and 'Profile URL'")
+    return {
+        "students": students,
+        "next_cursor": encode_cursor(students[-1]) if len(students) == limit else None,
+        "limit": limit
+    }
 
-    # Track duplicates but don't remove them - they'll be identified in the export
-    # Each upload will update existing records with the new data
+@app.get("/students/search")
+async def search_students(
+    name: Optional[str] = None,
+    status: Optional[str] = "All",
+    xp: Optional[str] = None,
+    badges: Optional[str] = None,
+    certs: Optional[str] = "All",
+    champion: Optional[str] = "All",
+    innovator: Optional[str] = "All",
+    legend: Optional[str] = "All",
+    skip: int = 0,
+    limit: int = 50,
+    fields: Optional[str] = None
+):
+    """
+    Filtered leaderboard with the same filters as /export, over public profiles.
+    Filters run on fields precomputed at write time; `counts` holds facet totals
+    (complete, with certifications, Champion/Innovator/Legend) for the whole match.
+    """
+    limit = max(1, min(limit, PAGE_MAX_LIMIT))
+    projection = page_projection(fields)
+
+    query = search_query(normalize_filters(name, status, xp, badges, certs, champion, innovator, legend))
+    result = await students_repo.search(query, FACET_COUNTS, max(0, skip), limit, projection)
+
+    # Ranks stay leaderboard-wide, not positions within the filtered list
+    await rank_index.ensure_synced()
+    for s in result["students"]:
+        s["rank"] = rank_index.rank(s["roll_number"])
+
+    return {
+        "students": result["students"],
+        # An empty match has no facet row; every count is still present, as 0
+        "counts": {**{key: 0 for key in FACET_COUNTS if key != "_id"}, **result["counts"]},
+        "skip": max(0, skip),
+        "limit": limit
+    }
 
-    tasks_started = 0
-    for _, row in df.iterrows():
-        roll = str(row[roll_col]).strip()
-        url = str(row[url_col]).strip()
-        name = str(row[name_col]).strip() if name_col and pd.notna(row[name_col]) else ""
-
-        if not url or pd.isna(url):
-            continue
-
-        # Validate URL format - must end with an ID (alphanumeric string after last /)
-        import re
-        url_valid = False
-        if "trailblazer.me" in url or "salesforce.com/trailblazer" in url:
-            # Extract the last part after /
-            parts = url.rstrip('/').split('/')
-            if len(parts) > 0:
-                last_part = parts[-1]
-                # Check if it's an ID (alphanumeric, at least 8 chars)
-                if re.match(r'^[a-zA-Z0-9]{8,}$', last_part):
-                    url_valid = True
-        
-        # Upsert student into DB as placeholder
-        student_doc = {
-            "roll_number": roll,
-            "profile_url": url,
-            "name": name,
-        }
-        
-        if not url_valid:
-            # Invalid URL format - mark immediately
-            student_doc["scrape_error"] = "Invalid Profile URL Format"
-            student_doc["points"] = 0
-            student_doc["badges"] = 0
-            students_collection.update_one(
-                {"roll_number": roll},
-                {"$set": student_doc},
-                upsert=True
-            )
-            continue
-        else:
-            # Valid format - mark as pending verification
-            student_doc["scrape_error"] = "Pending Verification"
-        
-        # Only set default points/badges if new document
-        students_collection.update_one(
-            {"roll_number": roll},
-            {"$set": student_doc, "$setOnInsert": {"points": 0, "badges": 0, "certifications": [], "agentblazer_status": []}},
-            upsert=True
-        )
+RANK_MAX_K = 500
 
-        # Trigger background scrape
-        background_tasks.add_task(process_student_scrape, roll, url)
-        tasks_started += 1
+@app.get("/students/{roll_number}/rank")
+async def get_student_rank(roll_number: str):
+    """
+    A single student's current rank (ties on points and badges share a rank).
+    """
+    await rank_index.ensure_synced()
+    entry = rank_index.get(roll_number)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return {**entry, "total": len(rank_index)}
 
-    return {"message": f"Processing {tasks_started} students in background."}
+@app.get("/students/{roll_number}/neighbours")
+async def get_student_neighbours(roll_number: str, radius: int = 5):
+    """
+    Students ranked just above and below one student, in leaderboard order.
+    """
+    await rank_index.ensure_synced()
+    radius = max(0, min(radius, RANK_MAX_K))
+    students = rank_index.neighbours(roll_number, radius)
+    if not students:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return {"students": students, "total": len(rank_index)}
 
-@app.get("/students")
-def get_leaderboard():
+@app.get("/leaderboard/top")
+async def get_leaderboard_top(k: int = 10):
     """
-    Get sorted leaderboard.
+    The top k students from the in-memory rank index.
     """
-    # Force float for sorting just in case
-    students = list(students_collection.find({}, {"_id": 0}))
-    
-    # Sort in memory to handle points possibly being strings in rare cases
-    # or rely on mongo sort if schema is strict.
-    # Mongo sort:
-    students_cursor = students_collection.find({}, {"_id": 0}).sort([("points", -1), ("badges", -1)])
-    students_list = list(students_cursor)
-    
-    # Add rank dynamically
-    for idx, s in enumerate(students_list):
-        s["rank"] = idx + 1
-        
-    return students_list
+    await rank_index.ensure_synced()
+    k = max(1, min(k, RANK_MAX_K))
+    return {"students": rank_index.top(k), "total": len(rank_index)}
 
 @app.post("/scrape/{roll_number}")
-async def force_scrape(roll_number: str, background_tasks: BackgroundTasks):
-    student = students_collection.find_one({"roll_number": roll_number})
+async def force_scrape(roll_number: str, force: bool = False):
+    """
+    Queues a re-scrape of one student. A recent cached result for the profile
+    is reused unless force=true.
+    """
+    # Look up and set status to scraping in one round-trip
+    student = await students_repo.flag_scraping(roll_number, projection={"profile_url": 1})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    
-    # Set status to scraping immediately
-    students_collection.update_one(
-        {"roll_number": roll_number},
-        {"$set": {"is_scraping": True}}
-    )
+    leaderboard_cache.invalidate()
 
-    background_tasks.add_task(process_student_scrape, roll_number, student["profile_url"])
+    await run_db(enqueue_scrape, roll_number, student["profile_url"], force=force)
     return {"message": f"Scrape started for {roll_number}"}
 
 @app.post("/scrape-all")
-async def force_scrape_all(background_tasks: BackgroundTasks):
+async def force_scrape_all(full: bool = False, limit: Optional[int] = None):
     """
-    Triggers a background scrape for ALL students in the database.
+    Triggers a background scrape for students that are due a refresh.
+    Fresh, stable and permanently failing profiles are skipped per the refresh policy;
+    pass full=true to scrape ALL students in the database.
     """
-    students = list(students_collection.find({}, {"roll_number": 1, "profile_url": 1}))
+    students = await students_repo.find({}, {
+        "roll_number": 1, "profile_url": 1, "last_updated": 1, "scrape_error": 1, "profile_status": 1,
+        "unchanged_streak": 1, "consecutive_failures": 1
+    })
     
-    # Set all to scraping
-    students_collection.update_many(
-        {}, 
-        {"$set": {"is_scraping": True}}
-    )
-
-    count = 0
-    for s in students:
-        if "profile_url" in s and s["profile_url"]:
-            background_tasks.add_task(process_student_scrape, s["roll_number"], s["profile_url"])
-            count += 1
+    total = len(students)
+    if not full:
+        students = select_due_students(students, max_batch=limit or REFRESH_MAX_BATCH)
     
-    return {"message": f"Started background scrape for {count} students."}
+    # Set selected students to scraping
+    await students_repo.flag_many_scraping([s["roll_number"] for s in students])
+    leaderboard_cache.invalidate()
 
-from fastapi.responses import Response
+    work = [(s["roll_number"], s["profile_url"]) for s in students if "profile_url" in s and s["profile_url"]]
+    count = await run_db(enqueue_many, work, PRIORITY_REFRESH)
+    
+    return {"message": f"Started background scrape for {count} students ({total - count} up to date or backing off)."}
+
+def check_export_format(format: str):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}")
+
+async def export_response(entry, hit: bool, filename: str, format: str) -> StreamingResponse:
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}.{format}"',
+        'Content-Length': str(entry.size),
+        'X-Export-Cache': 'hit' if hit else 'miss'
+    }
+    # The cache keeps the file until it has been streamed, even if a newer build evicts it
+    return StreamingResponse(await export_cache.stream(entry), media_type=MEDIA_TYPES[format], headers=headers)
 
 @app.get("/export")
 async def export_leaderboard(
@@ -307,270 +406,42 @@ async def export_leaderboard(
     certs: Optional[str] = "All",
     champion: Optional[str] = "All",
     innovator: Optional[str] = "All",
-    legend: Optional[str] = "All"
+    legend: Optional[str] = "All",
+    format: str = "xlsx"
 ):
     """
     Export leaderboard to Excel with filtering.
+    format=csv or format=parquet gives just the filtered Leaderboard sheet.
+    Built on the export thread pool and cached until the data changes.
     """
-    # Get all students sorted
-    students_cursor = students_collection.find({}, {"_id": 0}).sort([("points", -1), ("badges", -1)])
-    students = list(students_cursor)
-    
-    # Create DataFrames
-    public_data = []
-    private_data = []
-    invalid_url_data = []
-    
-    # Find duplicates in the database (same roll number appearing multiple times)
-    from collections import Counter
-    all_roll_numbers = [s.get("roll_number", "") for s in students]
-    roll_counter = Counter(all_roll_numbers)
-    duplicate_rolls = {roll for roll, count in roll_counter.items() if count > 1}
-    duplicate_data = []
-
-    for idx, s in enumerate(students):
-        # Flatten stats
-        champion_status = "Yes" if any("Champion 2026" in status_s for status_s in s.get("agentblazer_status", [])) else "No"
-        innovator_status = "Yes" if any("Innovator 2026" in status_s for status_s in s.get("agentblazer_status", [])) else "No"
-        legend_status = "Yes" if any("Legend 2026" in status_s for status_s in s.get("agentblazer_status", [])) else "No"
-        
-        url = s.get("profile_url", "")
-        # Basic validation check for Salesforce/Trailhead URL
-        is_trailhead = "trailblazer.me" in url or "salesforce.com/trailblazer" in url
-        
-        # Check if profile is private/error
-        error = str(s.get("scrape_error", ""))
-        error_lower = error.lower()
-        
-        # Determine Status Categories
-        is_private = "access denied" in error_lower or "private" in error_lower or "hidden" in error_lower or "pending" in error_lower
-        is_invalid = "not found" in error_lower or "404" in error_lower or "navigation failed" in error_lower or "invalid" in error_lower
-        
-        row = {
-            "Rank": idx + 1 if (not is_private and not is_invalid and is_trailhead) else "N/A",
-            "Roll Number": s.get("roll_number", ""),
-            "Name": s.get("name", ""),
-            "Points": s.get("points", 0),
-            "Badges": s.get("badges", 0),
-            "Certifications": ", ".join(s.get("certifications", [])) if isinstance(s.get("certifications"), list) else s.get("certifications", ""),
-            "Champion 2026": champion_status,
-            "Innovator 2026": innovator_status,
-            "Legend 2026": legend_status,
-            "Profile URL": url,
-            "Status": "Public",
-            "Error Details": error if error and error != "None" else ""
-        }
-        
-        # APPLY FILTERS
-        if (not is_private and not is_invalid and is_trailhead):
-            # Name/Roll Filter
-            if name:
-                search_term = name.lower()
-                student_name = (s.get("name") or "").lower()
-                roll_num = (s.get("roll_number") or "").lower()
-                if search_term not in student_name and search_term not in roll_num:
-                    continue
-
-            # Status Filter (Complete >= 10 badges)
-            if status != "All":
-                is_complete = s.get("badges", 0) >= 10
-                current_status = "Complete" if is_complete else "In Progress"
-                if current_status != status:
-                    continue
-
-            # XP Filter
-            if xp and xp.strip() != "":
-                try:
-                    if s.get("points", 0) < int(xp):
-                        continue
-                except ValueError:
-                    pass
-
-            # Badges Filter
-            if badges and badges.strip() != "":
-                try:
-                    if s.get("badges", 0) < int(badges):
-                        continue
-                except ValueError:
-                    pass
-
-            # Certs Filter
-            if certs != "All":
-                has_certs = len(s.get("certifications", [])) > 0
-                if (certs == "Yes" and not has_certs) or (certs == "No" and has_certs):
-                    continue
-
-            # Agentblazer Status Filters
-            if champion != "All":
-                if (champion == "Yes" and champion_status == "No") or (champion == "No" and champion_status == "Yes"):
-                    continue
-            
-            if innovator != "All":
-                if (innovator == "Yes" and innovator_status == "No") or (innovator == "No" and innovator_status == "Yes"):
-                    continue
-            
-            if legend != "All":
-                if (legend == "Yes" and legend_status == "No") or (legend == "No" and legend_status == "Yes"):
-                    continue
-
-            # If all filters pass, add to public
-            row["Status"] = "Public"
-            public_data.append(row)
-        
-        elif not is_trailhead:
-             row["Status"] = "Invalid URL Format"
-             invalid_url_data.append(row)
-             # Don't filter out Invalid/Private from their specific sheets, they are report sheets
-        elif is_private:
-            row["Status"] = "Private Profile"
-            private_data.append(row)
-        elif is_invalid:
-             row["Status"] = "Invalid/Not Found"
-             invalid_url_data.append(row)
-        
-        # Track if this is a duplicate roll number
-        if s.get("roll_number", "") in duplicate_rolls:
-            dup_row = row.copy()
-            dup_row["Duplicate_Issue"] = "Duplicate Roll Number"
-            duplicate_data.append(dup_row)
-        
-    df_public = pd.DataFrame(public_data)
-    df_private = pd.DataFrame(private_data)
-    df_invalid = pd.DataFrame(invalid_url_data)
-    df_duplicates = pd.DataFrame(duplicate_data)
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        if not df_public.empty:
-            df_public.to_excel(writer, index=False, sheet_name='Leaderboard')
-        else:
-            pd.DataFrame({'Message': ['No matching profiles found with current filters']}).to_excel(writer, sheet_name='Leaderboard')
-            
-        if not df_private.empty:
-            df_private.to_excel(writer, index=False, sheet_name='Private Profiles')
-        else:
-             pd.DataFrame({'Message': ['No private profiles found']}).to_excel(writer, sheet_name='Private Profiles')
-             
-        if not df_invalid.empty:
-            df_invalid.to_excel(writer, index=False, sheet_name='Invalid URLs')
-        else:
-             pd.DataFrame({'Message': ['No invalid URLs found']}).to_excel(writer, sheet_name='Invalid URLs')
-             
-        if not df_duplicates.empty:
-            df_duplicates.to_excel(writer, index=False, sheet_name='Duplicates')
-        
-    output.seek(0)
-    
-    headers = {
-        'Content-Disposition': 'attachment; filename="leaderboard.xlsx"'
-    }
-    return Response(content=output.getvalue(), media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers=headers)
+    check_export_format(format)
+    filters = normalize_filters(name, status, xp, badges, certs, champion, innovator, legend)
+    entry, hit = await leaderboard_export(format, filters)
+    return await export_response(entry, hit, "leaderboard", format)
 
 @app.get("/admin/export")
-async def export_admin_list():
+async def export_admin_list(format: str = "xlsx"):
     """
     Export admin panel student list with detailed information.
+    format=csv or format=parquet gives the All Students sheet.
     """
-    students_cursor = students_collection.find({}, {"_id": 0}).sort([("roll_number", 1)])
-    students = list(students_cursor)
-    
-    all_students_data = []
-    
-    for s in students:
-        # Get agentblazer status
-        agentblazer = s.get("agentblazer_status", [])
-        champion = "✓" if "Champion 2026" in str(agentblazer) else ""
-        innovator = "✓" if "Innovator 2026" in str(agentblazer) else ""
-        legend = "✓" if "Legend 2026" in str(agentblazer) else ""
-        
-        # Determine current module
-        current_module = ""
-        if legend:
-            current_module = "Legend 2026"
-        elif innovator:
-            current_module = "Innovator 2026"
-        elif champion:
-            current_module = "Champion 2026"
-        else:
-            current_module = "Not Started"
-        
-        # Get error status
-        error = str(s.get("scrape_error", ""))
-        error_lower = error.lower()
-        
-        # Categorize status with improved logic
-        status = "Valid"
-        if error:
-            # Check for invalid URL format first
-            if "invalid profile url format" in error_lower:
-                status = "Invalid Profile Format"
-            # Check for private/access issues
-            elif ("private" in error_lower or "access" in error_lower or 
-                  "cannot access data" in error_lower or "hidden" in error_lower):
-                status = "Private URL"
-            # Check for pending verification
-            elif "pending" in error_lower:
-                status = "Pending Verification"
-            # Check for not found/404
-            elif "not found" in error_lower or "404" in error_lower:
-                status = "Profile Not Found"
-            # Any other error
-            else:
-                status = "Error"
-        
-        row = {
-            "Roll Number": s.get("roll_number", ""),
-            "Name": s.get("name", ""),
-            "Profile URL": s.get("profile_url", ""),
-            "Points": s.get("points", 0),
-            "Badges": s.get("badges", 0),
-            "Certifications": ", ".join(s.get("certifications", [])) if isinstance(s.get("certifications"), list) else "",
-            "Champion 2026": champion,
-            "Innovator 2026": innovator,
-            "Legend 2026": legend,
-            "Current Module": current_module,
-            "Status": status,
-            "Error Details": error if error else ""
-        }
-        
-        all_students_data.append(row)
-    
-    # Create DataFrame
-    df = pd.DataFrame(all_students_data)
-    
-    # Create Excel file
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='All Students')
-        
-        # Separate sheets by status
-        df_valid = df[df['Status'] == 'Valid']
-        df_private = df[df['Status'] == 'Private URL']
-        df_invalid_format = df[df['Status'] == 'Invalid Profile Format']
-        df_not_found = df[df['Status'] == 'Profile Not Found']
-        df_pending = df[df['Status'] == 'Pending Verification']
-        
-        if not df_valid.empty:
-            df_valid.to_excel(writer, index=False, sheet_name='Valid Profiles')
-        
-        if not df_private.empty:
-            df_private.to_excel(writer, index=False, sheet_name='Private URLs')
-        
-        if not df_invalid_format.empty:
-            df_invalid_format.to_excel(writer, index=False, sheet_name='Invalid Format')
-        
-        if not df_not_found.empty:
-            df_not_found.to_excel(writer, index=False, sheet_name='Not Found')
-        
-        if not df_pending.empty:
-            df_pending.to_excel(writer, index=False, sheet_name='Pending Verification')
-    
-    output.seek(0)
-    
-    headers = {
-        'Content-Disposition': 'attachment; filename="admin_student_list.xlsx"'
-    }
-    return Response(content=output.getvalue(), media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers=headers)
+    check_export_format(format)
+    entry, hit = await admin_export(format)
+    return await export_response(entry, hit, "admin_student_list", format)
+
+@app.get("/admin/scrape-cache")
+async def get_scrape_cache():
+    """
+    Hit/miss counts, size and per-outcome TTLs of the scrape result cache.
+    """
+    return scraper.cache.stats()
+
+@app.get("/admin/export-cache")
+async def get_export_cache():
+    """
+    Size, hit/miss and eviction counts of the generated-export cache.
+    """
+    return export_cache.stats()
 
 if __name__ == "__main__":
     import uvicorn
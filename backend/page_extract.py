@@ -0,0 +1,100 @@
+from profile_api import POSSIBLE_STATUSES
+
+# Runs inside the page. Walks the light DOM and every shadow root once and
+# returns tallies, certifications and Agentblazer levels in a single round-trip.
+EXTRACT_SCRIPT = """
+(statuses) => {
+    const roots = [document];
+    for (let i = 0; i < roots.length; i++) {
+        roots[i].querySelectorAll('*').forEach((el) => {
+            if (el.shadowRoot) roots.push(el.shadowRoot);
+        });
+    }
+    const all = (selector) => {
+        const out = [];
+        roots.forEach((root) => root.querySelectorAll(selector).forEach((el) => out.push(el)));
+        return out;
+    };
+    const deepText = (el) => {
+        let text = el.innerText || el.textContent || '';
+        if (el.shadowRoot) {
+            el.shadowRoot.querySelectorAll('*').forEach((child) => { text += ' ' + deepText(child); });
+        }
+        return text;
+    };
+    const clean = (t) => (t || '').trim();
+
+    const counts = [];
+    all('lwc-tbui-tally').forEach((tally) => {
+        (tally.shadowRoot || tally).querySelectorAll('.tally__count').forEach((el) => counts.push(clean(el.innerText || el.textContent)));
+    });
+
+    let certifications = all('a[href*="/credentials/certification-detail"], a[href*="/certificate/"]')
+        .map((a) => clean(a.innerText || a.textContent))
+        .filter((t) => t);
+    if (certifications.length === 0) {
+        certifications = all('.content-body .title a')
+            .map((a) => clean(a.innerText || a.textContent))
+            .filter((t) => t && t.includes('Certified'));
+    }
+
+    let levelText = all('lwc-tbme-agentblazer-level').map(deepText).join(' ');
+    let found = statuses.filter((s) => levelText.includes(s));
+    if (found.length === 0) {
+        const pageText = roots.map((root) => (root === document ? document.body : root))
+            .filter((node) => node)
+            .map((node) => node.textContent || '')
+            .join(' ');
+        found = statuses.filter((s) => pageText.includes(s));
+    }
+
+    return { counts, certifications: [...new Set(certifications)], agentblazer_status: found };
+}
+"""
+
+
+async def extract_profile(page):
+    """
+    Extracts every profile field with one page.evaluate call.
+    Returns {"counts": [...], "certifications": [...], "agentblazer_status": [...]}.
+    """
+    return await page.evaluate(EXTRACT_SCRIPT, POSSIBLE_STATUSES)
+
+
+async def extract_profile_with_locators(page):
+    """
+    The previous locator-based extraction, one CDP round-trip per element.
+    Kept for bench_extraction.py comparisons.
+    """
+    counts = await page.locator("lwc-tbui-tally .tally__count").all_inner_texts()
+
+    certifications = []
+    cert_links = page.locator('a[href*="/credentials/certification-detail"], a[href*="/certificate/"]')
+    count = await cert_links.count()
+    for i in range(count):
+        text = await cert_links.nth(i).inner_text()
+        if text:
+            certifications.append(text.strip())
+    if not certifications:
+        title_links = page.locator('.content-body .title a')
+        count = await title_links.count()
+        for i in range(count):
+            text = await title_links.nth(i).inner_text()
+            if text and "Certified" in text:
+                certifications.append(text.strip())
+
+    agentblazer_status = []
+    status_locator = page.locator('lwc-tbme-agentblazer-level')
+    if await status_locator.count() > 0:
+        status_text_joined = " ".join(await status_locator.all_inner_texts())
+        agentblazer_status = [s for s in POSSIBLE_STATUSES if s in status_text_joined]
+    if not agentblazer_status:
+        for s in POSSIBLE_STATUSES:
+            if await page.get_by_text(s).count() > 0:
+                agentblazer_status.append(s)
+
+    return {
+        "counts": counts,
+        "certifications": list(set(certifications)),
+        "agentblazer_status": agentblazer_status
+    }
@@ -0,0 +1,107 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+# The one knob pair for sharded scraping: processes, and browser tabs inside each
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "1"))
+SCRAPE_TABS_PER_WORKER = int(os.getenv("SCRAPE_TABS_PER_WORKER", "3"))
+
+_DONE = "__shard_done__"
+
+
+async def _run_shard(shard, tabs, results):
+    # Imported here so each worker process builds its own browser and scraper
+    from scraper import TrailheadScraper
+    from concurrency import AdaptiveLimiter
+    from profile_status import annotate
+
+    # Browser pages stay capped at `tabs`; the limiter adapts how many scrapes run at once
+    scraper = TrailheadScraper(pool_size=tabs)
+    await scraper.start()
+    limiter = AdaptiveLimiter(initial=tabs, name=f"worker-{os.getpid()}")
+
+    async def scrape_one(key, url):
+        try:
+            async with limiter.slot() as slot:
+                data = await scraper.scrape_profile(url)
+                slot.report(data)
+        except Exception as e:
+            data = annotate({"points": 0, "badges": 0, "error": str(e)})
+        results.put((key, data))
+
+    try:
+        await asyncio.gather(*(scrape_one(key, url) for key, url in shard))
+    finally:
+        logger.info(f"Worker {os.getpid()} finished with concurrency limit {limiter.limit}, "
+                    f"scrape cache {scraper.cache.stats()}")
+        await scraper.stop()
+
+
+def _worker_main(shard, tabs, results):
+    """Entry point of one worker process."""
+    try:
+        asyncio.run(_run_shard(shard, tabs, results))
+    finally:
+        results.put((_DONE, os.getpid()))
+
+
+async def scrape_in_processes(items, on_result, workers: int = SCRAPE_WORKERS, tabs: int = SCRAPE_TABS_PER_WORKER):
+    """
+    Scrapes (key, url) pairs across `workers` processes with `tabs` pages each.
+    Every result is handed to `on_result(key, data)` in this process as soon as it
+    arrives (awaited if it is a coroutine function). Returns a throughput report.
+    """
+    items = list(items)
+    workers = max(1, min(workers, len(items) or 1))
+    shards = [items[i::workers] for i in range(workers)]
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker_main, args=(shard, tabs, results), daemon=True) for shard in shards]
+
+    started = time.perf_counter()
+    for p in processes:
+        p.start()
+    logger.info(f"Started {workers} scrape workers x {tabs} tabs for {len(items)} profiles")
+
+    loop = asyncio.get_running_loop()
+    finished = set()
+    pages = 0
+    while len(finished) < len(processes):
+        try:
+            key, data = await loop.run_in_executor(None, results.get, True, 1.0)
+        except queue.Empty:
+            # A worker killed hard (OOM, Chromium crash) never sends its sentinel
+            for p in processes:
+                if p.pid not in finished and p.exitcode is not None and not p.is_alive():
+                    logger.error(f"Scrape worker {p.pid} exited with code {p.exitcode}")
+                    finished.add(p.pid)
+            continue
+
+        if key == _DONE:
+            finished.add(data)
+            continue
+
+        pages += 1
+        outcome = on_result(key, data)
+        if asyncio.iscoroutine(outcome):
+            await outcome
+
+    for p in processes:
+        p.join(timeout=10)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        "workers": workers,
+        "tabs_per_worker": tabs,
+        "pages": pages,
+        "elapsed_seconds": round(elapsed, 1),
+        "pages_per_minute": round(pages / elapsed * 60, 1) if elapsed > 0 else 0.0
+    }
+    logger.info(f"Sharded scrape finished: {report}")
+    return report
@@ -0,0 +1,338 @@
+import re
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# GraphQL endpoint the Trailblazer profile LWC components talk to
+PROFILE_API_URL = "https://profile.api.trailhead.com/graphql"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36"
+
+POSSIBLE_STATUSES = ['Champion 2026', 'Innovator 2026', 'Legend 2026']
+
+# Matches the profile slug in both URL families we accept on upload
+SLUG_PATTERN = re.compile(
+    r"(?:salesforce\.com/trailblazer|trailblazer\.me/id)/([A-Za-z0-9_-]+)",
+    re.IGNORECASE
+)
+
+# Responses that mean Trailhead wants fewer requests, not a browser retry
+THROTTLE_STATUSES = (429, 503)
+
+RANK_QUERY = """
+query GetTrailheadRank($slug: String, $hasSlug: Boolean!) {
+  profile(slug: $slug) @include(if: $hasSlug) {
+    __typename
+    ... on PublicProfile {
+      trailheadStats {
+        earnedPointsSum
+        earnedBadgesCount
+        completedTrailCount
+        rank { title }
+      }
+    }
+  }
+}
+"""
+
+CERTIFICATIONS_QUERY = """
+query GetUserCertifications($slug: String, $hasSlug: Boolean!) {
+  profile(slug: $slug) @include(if: $hasSlug) {
+    __typename
+    ... on PublicProfile {
+      credential {
+        certifications {
+          title
+          dateCompleted
+          status { title expired }
+        }
+      }
+    }
+  }
+}
+"""
+
+AGENTBLAZER_QUERY = """
+query GetAgentblazerStatus($slug: String, $hasSlug: Boolean!) {
+  profile(slug: $slug) @include(if: $hasSlug) {
+    __typename
+    ... on PublicProfile {
+      learnerStatusLevels {
+        title
+        edition
+        completedAt
+      }
+    }
+  }
+}
+"""
+
+
+def extract_slug(url: str) -> Optional[str]:
+    """Returns the profile slug from a Trailblazer URL, or None if it has none."""
+    if not url:
+        return None
+    match = SLUG_PATTERN.search(url)
+    return match.group(1) if match else None
+
+
+def canonical_profile_id(url: str) -> Optional[str]:
+    """
+    The profile's identity regardless of URL variant: trailblazer.me/id vs
+    salesforce.com/trailblazer, trailing slash, query string or letter case.
+    """
+    slug = extract_slug(url)
+    return slug.lower() if slug else None
+
+
+def _walk(node):
+    """Yields every dict nested anywhere inside a JSON payload."""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk(item)
+
+
+def _strings(node):
+    """Yields every string value nested inside a JSON payload."""
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from _strings(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _strings(item)
+
+
+def profile_typename(payload) -> Optional[str]:
+    """Returns the __typename of the profile node ('PublicProfile', 'PrivateProfile', ...)."""
+    for node in _walk(payload):
+        profile = node.get("profile")
+        if isinstance(profile, dict) and "__typename" in profile:
+            return profile["__typename"]
+    return None
+
+
+def parse_tallies(payload):
+    """Returns (points, badges) from a rank payload, or None if it carries no tallies."""
+    for node in _walk(payload):
+        if "earnedPointsSum" in node and "earnedBadgesCount" in node:
+            return int(node.get("earnedPointsSum") or 0), int(node.get("earnedBadgesCount") or 0)
+    return None
+
+
+def parse_certifications(payload):
+    """Returns the certification titles from a credential payload, or None if absent."""
+    for node in _walk(payload):
+        certs = node.get("certifications")
+        if isinstance(certs, list):
+            titles = []
+            for cert in certs:
+                if isinstance(cert, dict) and cert.get("title"):
+                    titles.append(cert["title"].strip())
+            return list(set(titles))
+    return None
+
+
+def parse_agentblazer_status(payload):
+    """Returns the Agentblazer levels mentioned anywhere in a payload."""
+    found = set()
+    for text in _strings(payload):
+        for s in POSSIBLE_STATUSES:
+            if s in text:
+                found.add(s)
+    return [s for s in POSSIBLE_STATUSES if s in found]
+
+
+def has_status_payload(payload) -> bool:
+    """True if a payload carries the Agentblazer section, even when no level is earned."""
+    for node in _walk(payload):
+        for key in node.keys():
+            lowered = key.lower()
+            if "agentblazer" in lowered or "learnerstatus" in lowered:
+                return True
+    return False
+
+
+class ProfileResponseCapture:
+    """
+    Collects profile data from the XHR/fetch responses of a loading profile page.
+    Attach on_response to page.on("response") before navigating, then await wait().
+    """
+
+    def __init__(self):
+        self.tallies = None
+        self.certifications = None
+        self.agentblazer_status = set()
+        self.status_seen = False
+        self.private = False
+        self.done = asyncio.Event()
+
+    async def on_response(self, response):
+        if self.done.is_set():
+            return
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        try:
+            payload = await response.json()
+        except Exception:
+            return
+        self.feed(payload)
+
+    def feed(self, payload):
+        """Merges one JSON payload into the captured profile."""
+        if profile_typename(payload) == "PrivateProfile":
+            self.private = True
+            self.done.set()
+            return
+
+        tallies = parse_tallies(payload)
+        if tallies is not None:
+            self.tallies = tallies
+        certifications = parse_certifications(payload)
+        if certifications is not None:
+            self.certifications = certifications
+        if has_status_payload(payload):
+            self.status_seen = True
+        self.agentblazer_status.update(parse_agentblazer_status(payload))
+
+        if self.tallies is not None and self.certifications is not None and self.status_seen:
+            self.done.set()
+
+    def result(self):
+        """Returns the captured profile in the scraper's dict shape, or None if incomplete."""
+        if self.private:
+            return {"points": 0, "badges": 0, "certifications": [], "agentblazer_status": [],
+                    "error": "Profile Private"}
+        if not self.done.is_set():
+            return None
+        points, badges = self.tallies
+        if points == 0 and badges == 0:
+            return None
+        return {
+            "points": points,
+            "badges": badges,
+            "certifications": self.certifications,
+            "agentblazer_status": [s for s in POSSIBLE_STATUSES if s in self.agentblazer_status]
+        }
+
+    async def wait(self, timeout_ms: int):
+        """Waits for a complete payload; returns result() or None on timeout."""
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            return None
+        return self.result()
+
+
+class ProfileApiClient:
+    """
+    Browser-free profile fetcher.
+    Calls the same GraphQL operations as the profile page over a pooled HTTP client.
+    """
+
+    def __init__(self, timeout: float = 15.0, max_connections: int = 50):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.client = None
+
+    async def start(self):
+        if not self.client:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                headers={
+                    "User-Agent": USER_AGENT,
+                    "Accept": "application/json",
+                    "Accept-Language": "en-US,en;q=0.9",
+                    "Content-Type": "application/json",
+                    "Origin": "https://www.salesforce.com",
+                    "Referer": "https://www.salesforce.com/"
+                }
+            )
+
+    async def stop(self):
+        if self.client:
+            await self.client.aclose()
+        self.client = None
+
+    async def _query(self, operation: str, query: str, slug: str):
+        response = await self.client.post(PROFILE_API_URL, json={
+            "operationName": operation,
+            "query": query,
+            "variables": {"slug": slug, "hasSlug": True}
+        })
+        response.raise_for_status()
+        body = response.json()
+        if body.get("errors") and not body.get("data"):
+            raise ValueError(f"{operation} returned errors: {body['errors']}")
+        return body.get("data")
+
+    async def fetch_profile(self, url: str):
+        """
+        Fetches a profile without a browser.
+        Returns the same dict shape as the Playwright path, or None when the
+        profile can't be resolved this way and the caller should fall back.
+        Throttling (429/503) is returned as a Rate Limited error, not a fallback.
+        """
+        slug = extract_slug(url)
+        if not slug:
+            return None
+
+        if not self.client:
+            await self.start()
+
+        try:
+            rank_data = await self._query("GetTrailheadRank", RANK_QUERY, slug)
+            typename = profile_typename(rank_data)
+            if typename == "PrivateProfile":
+                return {"points": 0, "badges": 0, "certifications": [], "agentblazer_status": [],
+                        "error": "Profile Private"}
+
+            tallies = parse_tallies(rank_data)
+            if typename != "PublicProfile" or tallies is None:
+                return None
+
+            cert_data = await self._query("GetUserCertifications", CERTIFICATIONS_QUERY, slug)
+            certifications = parse_certifications(cert_data)
+            if certifications is None:
+                return None
+
+            status_data = await self._query("GetAgentblazerStatus", AGENTBLAZER_QUERY, slug)
+            agentblazer_status = parse_agentblazer_status(status_data)
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status in THROTTLE_STATUSES:
+                # Retrying in a browser would hit the same limit harder; let the limiter back off
+                logger.warning(f"Profile API throttled ({status}) for {url}")
+                return {"points": 0, "badges": 0, "error": f"Rate Limited ({status})"}
+            logger.info(f"Profile API could not resolve {url}: {e}")
+            return None
+        except (httpx.HTTPError, ValueError) as e:
+            logger.info(f"Profile API could not resolve {url}: {e}")
+            return None
+
+        points, badges = tallies
+        if points == 0 and badges == 0:
+            # Let the browser path make the private/empty call, as it always has
+            return None
+
+        return {
+            "points": points,
+            "badges": badges,
+            "certifications": certifications,
+            "agentblazer_status": agentblazer_status
+        }
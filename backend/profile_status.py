@@ -0,0 +1,62 @@
+"""
+Typed profile status, classified once when a result is written.
+
+Reads (exports, search, refresh policy) filter on the stored `profile_status` and
+`agentblazer_tier` fields instead of substring-matching `scrape_error` text.
+"""
+
+PUBLIC = "public"
+PRIVATE = "private"
+NOT_FOUND = "not_found"
+INVALID_FORMAT = "invalid_format"
+PENDING = "pending"
+TRANSIENT_ERROR = "transient_error"
+
+PROFILE_STATUSES = [PUBLIC, PRIVATE, NOT_FOUND, INVALID_FORMAT, PENDING, TRANSIENT_ERROR]
+# Profiles that keep their last scraped numbers on the public leaderboard
+RANKED_STATUSES = [PUBLIC, TRANSIENT_ERROR]
+
+INVALID_FORMAT_ERROR = "Invalid Profile URL Format"
+PENDING_ERROR = "Pending Verification"
+
+TRANSIENT_MARKERS = ["rate limited", "timeout", "timed out", "network error"]
+INVALID_FORMAT_MARKERS = ["invalid profile url format", "no url provided"]
+PRIVATE_MARKERS = ["private", "hidden", "access denied", "cannot access data"]
+NOT_FOUND_MARKERS = ["not found", "404", "invalid", "navigation failed"]
+
+# Highest first: a profile's tier is the best 2026 status it holds
+AGENTBLAZER_TIERS = [("legend", "Legend 2026"), ("innovator", "Innovator 2026"), ("champion", "Champion 2026")]
+
+
+def classify(error) -> str:
+    """Maps a scrape error message (None for success) onto one of PROFILE_STATUSES."""
+    if not error:
+        return PUBLIC
+    error_lower = str(error).lower()
+    if any(marker in error_lower for marker in TRANSIENT_MARKERS):
+        return TRANSIENT_ERROR
+    if any(marker in error_lower for marker in INVALID_FORMAT_MARKERS):
+        return INVALID_FORMAT
+    if any(marker in error_lower for marker in PRIVATE_MARKERS):
+        return PRIVATE
+    if "pending" in error_lower:
+        return PENDING
+    if any(marker in error_lower for marker in NOT_FOUND_MARKERS):
+        return NOT_FOUND
+    return TRANSIENT_ERROR
+
+
+def agentblazer_tier(statuses) -> str:
+    """'legend', 'innovator', 'champion' or None for a list of agentblazer_status strings."""
+    text = " ".join(str(s) for s in statuses or [])
+    for tier, label in AGENTBLAZER_TIERS:
+        if label in text:
+            return tier
+    return None
+
+
+def annotate(data: dict) -> dict:
+    """Adds profile_status and agentblazer_tier to a scrape result."""
+    data["profile_status"] = classify(data.get("error"))
+    data["agentblazer_tier"] = agentblazer_tier(data.get("agentblazer_status"))
+    return data
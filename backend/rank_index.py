@@ -0,0 +1,214 @@
+import random
+import asyncio
+import logging
+
+from database import students_collection
+from repository import run_db, read_data_version
+
+logger = logging.getLogger(__name__)
+
+
+class _Node:
+    __slots__ = ("key", "priority", "left", "right", "size")
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.size = 1
+
+
+def _size(node):
+    return node.size if node else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+
+def _split(node, key):
+    """Splits into (keys < key, keys >= key)."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+class OrderStatisticTree:
+    """Treap over unique, comparable keys with O(log n) insert, remove, count_less and kth."""
+
+    def __init__(self):
+        self.root = None
+
+    def __len__(self):
+        return _size(self.root)
+
+    def insert(self, key):
+        left, right = _split(self.root, key)
+        self.root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key):
+        left, right = _split(self.root, key)
+        # Peel the single node equal to key off the front of `right`
+        removed, right = self._split_first(right, key)
+        self.root = _merge(left, right)
+
+    def _split_first(self, node, key):
+        """Removes the smallest node of `node` if it equals key; returns (removed, rest)."""
+        if node is None:
+            return None, None
+        if node.left is not None:
+            removed, node.left = self._split_first(node.left, key)
+            _update(node)
+            return removed, node
+        if node.key == key:
+            return node, node.right
+        return None, node
+
+    def count_less(self, key) -> int:
+        """Number of keys strictly less than `key`."""
+        count = 0
+        node = self.root
+        while node:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def kth(self, index: int):
+        """The key at 0-based position `index` in sorted order."""
+        node = self.root
+        while node:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node.key
+            else:
+                index -= left + 1
+                node = node.right
+        raise IndexError(index)
+
+
+class RankIndex:
+    """
+    In-memory leaderboard order keyed by (points desc, badges desc, roll_number).
+    Ranks use standard competition ranking ("1224"): students with equal points and
+    badges share a rank, and the next rank skips the tied places.
+    """
+
+    def __init__(self):
+        self.tree = OrderStatisticTree()
+        self.entries = {}
+        self.synced_version = None
+        self.lock = asyncio.Lock()
+
+    @staticmethod
+    def _key(roll_number, points, badges):
+        return (-int(points or 0), -int(badges or 0), roll_number)
+
+    def update(self, roll_number: str, points, badges):
+        """Inserts or moves one student. O(log n)."""
+        old = self.entries.get(roll_number)
+        if old is not None:
+            self.tree.remove(old)
+        key = self._key(roll_number, points, badges)
+        self.entries[roll_number] = key
+        self.tree.insert(key)
+
+    def note_local_write(self, version: int, results: list):
+        """
+        Applies scrape results this process just flushed as data `version`.
+        If anything else bumped the version in between, the next ensure_synced() rebuilds instead.
+        """
+        if self.synced_version is None or version != self.synced_version + 1:
+            return
+        for result in results:
+            self.update(result["roll_number"], result["points"], result["badges"])
+        self.synced_version = version
+
+    def rebuild(self, students, version: int):
+        self.tree = OrderStatisticTree()
+        self.entries = {}
+        for s in students:
+            self.update(s["roll_number"], s.get("points", 0), s.get("badges", 0))
+        self.synced_version = version
+
+    async def ensure_synced(self):
+        """Rebuilds from Mongo when another process (upload, separate worker) changed the data."""
+        version = await run_db(read_data_version)
+        if version == self.synced_version:
+            return
+        async with self.lock:
+            if version == self.synced_version:
+                return
+            students = await run_db(
+                lambda: list(students_collection.find({}, {"_id": 0, "roll_number": 1, "points": 1, "badges": 1}))
+            )
+            self.rebuild(students, version)
+            logger.info(f"Rebuilt rank index v{version} ({len(self.entries)} students)")
+
+    def _entry(self, key):
+        points, badges, roll_number = -key[0], -key[1], key[2]
+        return {
+            "roll_number": roll_number,
+            "points": points,
+            "badges": badges,
+            "rank": self.tree.count_less(key[:2]) + 1
+        }
+
+    def rank(self, roll_number: str):
+        """The student's competition rank, or None if unknown."""
+        key = self.entries.get(roll_number)
+        if key is None:
+            return None
+        # (-points, -badges) sorts before every full key with the same tier
+        return self.tree.count_less(key[:2]) + 1
+
+    def get(self, roll_number: str):
+        key = self.entries.get(roll_number)
+        return self._entry(key) if key is not None else None
+
+    def top(self, k: int) -> list:
+        k = max(0, min(k, len(self.tree)))
+        return [self._entry(self.tree.kth(i)) for i in range(k)]
+
+    def neighbours(self, roll_number: str, radius: int) -> list:
+        """Students within `radius` places above and below, in leaderboard order."""
+        key = self.entries.get(roll_number)
+        if key is None:
+            return []
+        position = self.tree.count_less(key)
+        start = max(0, position - radius)
+        end = min(len(self.tree), position + radius + 1)
+        return [self._entry(self.tree.kth(i)) for i in range(start, end)]
+
+    def __len__(self):
+        return len(self.tree)
+
+
+rank_index = RankIndex()
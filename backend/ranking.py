@@ -0,0 +1,28 @@
+"""
+The leaderboard's tie rule, shared by everything that emits a `rank`.
+
+Students are ordered by points, then badges (both descending). Students tied on
+both share a rank and the next rank skips past them (competition ranking:
+1, 2, 2, 4), which is what the rank index computes for its endpoints.
+"""
+
+
+def tier(student: dict) -> tuple:
+    return student.get("points", 0) or 0, student.get("badges", 0) or 0
+
+
+def assign_ranks(students: list, first_position: int = 1, first_rank: int = None) -> list:
+    """
+    Sets `rank` on students already in leaderboard order. first_position is the
+    absolute 1-based position of the first one; pass first_rank when a page
+    starts partway through a tie (defaults to first_position).
+    """
+    previous = None
+    rank = first_rank if first_rank is not None else first_position
+    for offset, s in enumerate(students):
+        current = tier(s)
+        if previous is not None and current != previous:
+            rank = first_position + offset
+        s["rank"] = rank
+        previous = current
+    return students
@@ -0,0 +1,116 @@
+import os
+from datetime import datetime, timedelta
+
+from profile_status import (classify, agentblazer_tier, PUBLIC, PENDING, PRIVATE,
+                            NOT_FOUND, INVALID_FORMAT, TRANSIENT_ERROR)
+
+# Freshness policy for incremental /scrape-all
+MIN_AGE_HOURS = float(os.getenv("REFRESH_MIN_AGE_HOURS", "6"))
+# Profiles whose numbers keep not changing wait up to this many extra MIN_AGE periods
+MAX_STABLE_STRETCH = int(os.getenv("REFRESH_MAX_STABLE_STRETCH", "4"))
+MAX_BATCH = int(os.getenv("REFRESH_MAX_BATCH", "500"))
+MAX_BACKOFF_HOURS = float(os.getenv("REFRESH_MAX_BACKOFF_HOURS", str(24 * 14)))
+
+# First retry delay per failure class; doubles with every consecutive failure
+BACKOFF_BASE_HOURS = {
+    "permanent": 24.0,
+    "private": 6.0
+}
+
+POLICY_CLASS = {
+    PUBLIC: "ok",
+    PENDING: "pending",
+    PRIVATE: "private",
+    NOT_FOUND: "permanent",
+    INVALID_FORMAT: "permanent",
+}
+
+
+def error_class(error, profile_status: str = None) -> str:
+    """
+    Buckets a result into 'ok', 'pending', 'permanent', 'private' or 'transient'.
+    Uses the stored profile_status when given, else classifies the error text.
+    Only permanent and private failures back off; transient ones retry on the next refresh.
+    """
+    return POLICY_CLASS.get(profile_status or classify(error), "transient")
+
+
+def result_update(data: dict, now: datetime = None) -> list:
+    """
+    Builds the update pipeline that stores a scrape result together with the
+    counters the refresh policy needs (unchanged_streak, consecutive_failures).
+    A transient failure only records the error: the student keeps the numbers
+    from the last successful scrape.
+    """
+    now = now or datetime.now()
+    points = data.get("points", 0)
+    badges = data.get("badges", 0)
+    error = data.get("error")
+    status = data.get("profile_status") or classify(error)
+    failed = error_class(error, status) in ("permanent", "private")
+
+    fields = {
+        "consecutive_failures": (
+            {"$add": [{"$ifNull": ["$consecutive_failures", 0]}, 1]} if failed else 0
+        ),
+        "last_updated": now.isoformat(),
+        "is_scraping": False,
+        "scrape_error": {"$literal": error},
+        "profile_status": status,
+    }
+    if status == TRANSIENT_ERROR:
+        return [{"$set": fields}]
+
+    return [{"$set": {
+        "unchanged_streak": {"$cond": [
+            {"$and": [{"$eq": ["$points", points]}, {"$eq": ["$badges", badges]}]},
+            {"$add": [{"$ifNull": ["$unchanged_streak", 0]}, 1]},
+            0
+        ]},
+        **fields,
+        "points": points,
+        "badges": badges,
+        "certifications": {"$literal": data.get("certifications", [])},
+        "agentblazer_status": {"$literal": data.get("agentblazer_status", [])},
+        "agentblazer_tier": {"$literal": data.get("agentblazer_tier") or agentblazer_tier(data.get("agentblazer_status"))}
+    }}]
+
+
+def next_refresh_at(student: dict):
+    """Returns when a student becomes due again, or None if it is due now."""
+    last_updated = student.get("last_updated")
+    if not last_updated:
+        return None
+    try:
+        last = datetime.fromisoformat(str(last_updated))
+    except ValueError:
+        return None
+
+    kind = error_class(student.get("scrape_error"), student.get("profile_status"))
+    if kind in ("pending", "transient"):
+        return None
+    if kind in BACKOFF_BASE_HOURS:
+        failures = max(1, int(student.get("consecutive_failures") or 1))
+        hours = min(BACKOFF_BASE_HOURS[kind] * (2 ** (failures - 1)), MAX_BACKOFF_HOURS)
+        return last + timedelta(hours=hours)
+
+    stretch = min(int(student.get("unchanged_streak") or 0), MAX_STABLE_STRETCH)
+    return last + timedelta(hours=MIN_AGE_HOURS * (1 + stretch))
+
+
+def select_due_students(students, now: datetime = None, max_batch: int = MAX_BATCH):
+    """
+    Picks the students that are due for a refresh, most overdue first, capped at max_batch.
+    `students` needs roll_number, profile_url, last_updated, profile_status (or scrape_error)
+    and the policy counters.
+    """
+    now = now or datetime.now()
+    due = []
+    for s in students:
+        if not s.get("profile_url"):
+            continue
+        at = next_refresh_at(s)
+        if at is None or at <= now:
+            due.append((at or datetime.min, s))
+    due.sort(key=lambda item: item[0])
+    return [s for _, s in due[:max_batch]]
@@ -0,0 +1,226 @@
+import os
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from database import students_collection, settings_collection
+
+# pymongo is synchronous; every call from async code runs on this pool so the
+# event loop keeps serving requests while Mongo round-trips are in flight
+DB_IO_THREADS = int(os.getenv("DB_IO_THREADS", "16"))
+db_executor = ThreadPoolExecutor(max_workers=DB_IO_THREADS, thread_name_prefix="mongo-io")
+
+LEADERBOARD_SORT = [("points", -1), ("badges", -1)]
+# Total order for keyset pagination: roll_number breaks points/badges ties
+KEYSET_SORT = [("points", -1), ("badges", -1), ("roll_number", 1)]
+
+# Stored for queries and bookkeeping (derived flags, search trigrams, refresh counters,
+# canonical profile ID); left out of every student payload sent to clients
+INTERNAL_FIELDS = ["search_grams", "derived_version", "is_complete", "has_certifications", "is_champion",
+                   "is_innovator", "is_legend", "is_public", "profile_id", "unchanged_streak",
+                   "consecutive_failures"]
+PUBLIC_PROJECTION = {"_id": 0, **{field: 0 for field in INTERNAL_FIELDS}}
+
+# Bumped on every write to students so caches in any process can tell the data changed
+DATA_VERSION_ID = "data_version"
+
+
+async def run_db(fn, *args, **kwargs):
+    """Runs a blocking database call on the Mongo I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(fn, *args, **kwargs))
+
+
+def bump_data_version() -> int:
+    """Marks student data as changed and returns the new version."""
+    doc = settings_collection.find_one_and_update(
+        {"_id": DATA_VERSION_ID},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+
+def read_data_version() -> int:
+    """Current student data version (0 before the first write)."""
+    doc = settings_collection.find_one({"_id": DATA_VERSION_ID})
+    return doc.get("version", 0) if doc else 0
+
+
+def bulk_write_report(collection, ops) -> dict:
+    """Runs one unordered bulk_write and returns its counts plus any per-op errors."""
+    report = {"ops": len(ops), "matched": 0, "modified": 0, "upserted": 0, "errors": []}
+    if not ops:
+        return report
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        report.update(matched=result.matched_count, modified=result.modified_count, upserted=result.upserted_count)
+    except BulkWriteError as e:
+        details = e.details
+        report.update(
+            matched=details.get("nMatched", 0),
+            modified=details.get("nModified", 0),
+            upserted=details.get("nUpserted", 0),
+            errors=[{"index": err.get("index"), "code": err.get("code"), "message": err.get("errmsg")}
+                    for err in details.get("writeErrors", [])]
+        )
+    return report
+
+
+class StudentRepository:
+    """Async access to the students collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find(self, query=None, projection=None, sort=None, limit: int = 0) -> list:
+        def _find():
+            cursor = self.collection.find(query or {}, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        return await run_db(_find)
+
+    def scan_batches(self, query=None, projection=None, sort=None, batch_size: int = 1000):
+        """
+        Yields lists of up to batch_size documents from a single cursor.
+        Blocking: iterate it from a worker thread (e.g. a StreamingResponse body).
+        """
+        cursor = self.collection.find(query or {}, projection, batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def duplicate_values(self, field: str) -> set:
+        """Values of `field` held by more than one student, from one aggregation. Blocking."""
+        pipeline = [
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        return {row["_id"] for row in self.collection.aggregate(pipeline, allowDiskUse=True)}
+
+    def count_by(self, field: str) -> dict:
+        """Number of students per value of `field`. Blocking."""
+        return {row["_id"]: row["count"] for row in
+                self.collection.aggregate([{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}])}
+
+    async def leaderboard(self, projection=None) -> list:
+        """All students in leaderboard order (points, then badges, descending)."""
+        return await self.find({}, projection if projection is not None else PUBLIC_PROJECTION, LEADERBOARD_SORT)
+
+    async def leaderboard_page(self, after=None, limit: int = 50, projection=None):
+        """
+        One page of the leaderboard in KEYSET_SORT order, starting after the
+        (points, badges, roll_number) key `after`. Returns (students, position_of_first,
+        rank_of_first): the first student's absolute 1-based position, and its
+        competition rank (1 + everyone with more points, or as many points and more badges).
+        """
+        def _page():
+            query = {}
+            ahead = 0
+            if after:
+                p, b, r = after
+                query = {"$or": [
+                    {"points": {"$lt": p}},
+                    {"points": p, "badges": {"$lt": b}},
+                    {"points": p, "badges": b, "roll_number": {"$gt": r}}
+                ]}
+                # Everyone up to and including the cursor, counted on the same index
+                ahead = self.collection.count_documents({"$or": [
+                    {"points": {"$gt": p}},
+                    {"points": p, "badges": {"$gt": b}},
+                    {"points": p, "badges": b, "roll_number": {"$lte": r}}
+                ]})
+            students = list(self.collection.find(query, projection).sort(KEYSET_SORT).limit(limit))
+            if not after or not students:
+                return students, ahead + 1, ahead + 1
+            fp, fb = students[0].get("points", 0), students[0].get("badges", 0)
+            better = self.collection.count_documents({"$or": [
+                {"points": {"$gt": fp}},
+                {"points": fp, "badges": {"$gt": fb}}
+            ]})
+            return students, ahead + 1, better + 1
+        return await run_db(_page)
+
+    async def search(self, query: dict, facet_counts: dict, skip: int = 0, limit: int = 50, projection=None) -> dict:
+        """
+        One page of matching students in leaderboard order plus `facet_counts`
+        (a $group spec) over everything that matched, in a single aggregation.
+        """
+        page = [{"$sort": dict(KEYSET_SORT)}, {"$skip": skip}, {"$limit": limit}]
+        if projection:
+            page.append({"$project": projection})
+        pipeline = [
+            {"$match": query},
+            {"$facet": {"students": page, "counts": [{"$group": facet_counts}]}}
+        ]
+        result = (await run_db(lambda: list(self.collection.aggregate(pipeline))))[0]
+        counts = result["counts"][0] if result["counts"] else {}
+        counts.pop("_id", None)
+        return {"students": result["students"], "counts": counts}
+
+    async def bulk_write(self, ops) -> dict:
+        """Unordered bulk write; returns counts and per-op errors (see bulk_write_report)."""
+        report = await run_db(bulk_write_report, self.collection, ops)
+        await run_db(bump_data_version)
+        return report
+
+    async def flag_scraping(self, roll_number: str, projection=None):
+        """Marks one student as scraping and returns it, or None if it doesn't exist."""
+        student = await run_db(
+            self.collection.find_one_and_update,
+            {"roll_number": roll_number},
+            {"$set": {"is_scraping": True}},
+            projection=projection,
+            return_document=ReturnDocument.BEFORE
+        )
+        if student:
+            await run_db(bump_data_version)
+        return student
+
+    async def flag_many_scraping(self, roll_numbers: list):
+        result = await run_db(
+            self.collection.update_many,
+            {"roll_number": {"$in": roll_numbers}},
+            {"$set": {"is_scraping": True}}
+        )
+        await run_db(bump_data_version)
+        return result
+
+
+class SettingsRepository:
+    """Async access to the settings collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get_maintenance(self) -> dict:
+        settings = await run_db(self.collection.find_one, {"_id": "maintenance"})
+        if settings:
+            return {"enabled": settings.get("enabled", False), "message": settings.get("message", "")}
+        return {"enabled": False, "message": ""}
+
+    async def set_maintenance(self, enabled: bool, message: str):
+        await run_db(
+            self.collection.update_one,
+            {"_id": "maintenance"},
+            {"$set": {"enabled": enabled, "message": message}},
+            upsert=True
+        )
+
+
+students_repo = StudentRepository(students_collection)
+settings_repo = SettingsRepository(settings_collection)
@@ -0,0 +1,269 @@
+"""
+Streaming roster ingestion for /upload.
+
+Rosters are read a chunk of rows at a time (openpyxl read-only mode for .xlsx,
+pandas' chunked parser for .csv), validated with vectorized column operations
+and turned into bulk writes, so memory stays bounded by the chunk size.
+"""
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+
+from database import students_collection
+from profile_api import SLUG_PATTERN
+from profile_status import INVALID_FORMAT, INVALID_FORMAT_ERROR, PENDING, PENDING_ERROR
+from student_fields import with_derived
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "5000"))
+ROSTER_FORMATS = (".xlsx", ".xls", ".csv")
+
+TRAILHEAD_URL_PATTERN = r"trailblazer\.me|salesforce\.com/trailblazer"
+# The last path segment must be a profile ID (alphanumeric, at least 8 chars)
+PROFILE_ID_PATTERN = r"[a-zA-Z0-9]{8,}"
+
+VALID = "valid"
+INVALID = "invalid_format"
+SKIPPED = "skipped"
+DUPLICATE = "duplicate"
+
+# How a persisted row compares with the stored student
+NEW = "new"
+URL_CHANGED = "url_changed"
+NAME_ONLY = "name_only"
+UNCHANGED = "unchanged"
+
+# What the diff needs from stored students
+STORED_PROJECTION = {"_id": 0, "roll_number": 1, "profile_url": 1, "name": 1, "profile_id": 1}
+
+NEW_STUDENT_DEFAULTS = {"points": 0, "badges": 0, "certifications": [], "agentblazer_status": []}
+
+
+class RosterError(ValueError):
+    """The upload can't be read as a roster."""
+
+
+def _find_columns(header) -> dict:
+    """Maps roll_number/profile_url/name onto header positions, with the usual flexible matching."""
+    names = [str(c).strip().lower() if c is not None else "" for c in header]
+    roll = next((i for i, c in enumerate(names) if 'roll' in c), None)
+    url = next((i for i, c in enumerate(names) if 'url' in c or 'link' in c or 'profile' in c), None)
+    name = next((i for i, c in enumerate(names) if 'name' in c), None)
+    if roll is None or url is None:
+        raise RosterError("Excel must contain columns for 'Roll Number' and 'Profile URL'")
+    return {"roll_number": roll, "profile_url": url, "name": name}
+
+
+def _text(value) -> str:
+    """Cell value as the string stored in Mongo (numeric roll numbers lose a trailing .0)."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _frame(rows: list, columns: dict, first_row: int) -> pd.DataFrame:
+    def column(key):
+        index = columns[key]
+        if index is None:
+            return [""] * len(rows)
+        return [_text(r[index]) if index < len(r) else "" for r in rows]
+
+    return pd.DataFrame({
+        "row": np.arange(first_row, first_row + len(rows)),
+        "roll_number": column("roll_number"),
+        "profile_url": column("profile_url"),
+        "name": column("name"),
+    })
+
+
+def _xlsx_chunks(file, chunk_rows: int):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        columns = _find_columns(next(rows, ()))
+        chunk, first_row = [], 2
+        for values in rows:
+            chunk.append(values)
+            if len(chunk) == chunk_rows:
+                yield _frame(chunk, columns, first_row)
+                first_row += len(chunk)
+                chunk = []
+        if chunk:
+            yield _frame(chunk, columns, first_row)
+    finally:
+        workbook.close()
+
+
+def _csv_chunks(file, chunk_rows: int):
+    reader = pd.read_csv(file, dtype=str, keep_default_na=False, encoding="utf-8-sig", chunksize=chunk_rows)
+    first_row, columns = 2, None
+    for df in reader:
+        columns = columns or _find_columns(df.columns)
+        yield _frame(df.to_numpy().tolist(), columns, first_row)
+        first_row += len(df)
+
+
+def _xls_chunks(file, chunk_rows: int):
+    # The legacy binary format has no streaming reader; these files are small by nature
+    df = pd.read_excel(file, header=None, dtype=object)
+    rows = df.where(df.notna(), None).to_numpy().tolist()
+    columns = _find_columns(rows[0] if rows else ())
+    for start in range(1, len(rows), chunk_rows):
+        yield _frame(rows[start:start + chunk_rows], columns, start + 1)
+
+
+def read_roster(file, filename: str, chunk_rows: int = UPLOAD_CHUNK_ROWS):
+    """
+    Yields DataFrames of (row, roll_number, profile_url, name) from an uploaded roster.
+    Blocking: iterate it off the event loop. Raises RosterError for unreadable files.
+    """
+    suffix = os.path.splitext(filename.lower())[1]
+    readers = {".xlsx": _xlsx_chunks, ".csv": _csv_chunks, ".xls": _xls_chunks}
+    if suffix not in readers:
+        raise RosterError("Invalid file format. Please upload an Excel or CSV file.")
+    try:
+        file.seek(0)
+        yield from readers[suffix](file, chunk_rows)
+    except RosterError:
+        raise
+    except Exception as e:
+        raise RosterError(f"Could not read {suffix[1:].upper()} file: {str(e)}")
+
+
+def validate(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds profile_id, result and reason columns; every check is a column operation.
+    profile_id is the canonical (lowercased slug) ID the scraper dedupes on, from the
+    same SLUG_PATTERN as canonical_profile_id(); "" where the URL has no slug.
+    """
+    missing_roll = df["roll_number"] == ""
+    missing_url = df["profile_url"] == ""
+    trailhead = df["profile_url"].str.contains(TRAILHEAD_URL_PATTERN, regex=True)
+    last_part = df["profile_url"].str.rstrip("/").str.rsplit("/", n=1).str[-1]
+    has_id = last_part.str.fullmatch(PROFILE_ID_PATTERN).fillna(False)
+
+    slug = df["profile_url"].str.extract(SLUG_PATTERN.pattern, flags=SLUG_PATTERN.flags)[0]
+    df["profile_id"] = slug.str.lower().fillna("").where(trailhead & has_id, "")
+    df["result"] = np.select(
+        [missing_roll | missing_url, ~(trailhead & has_id)], [SKIPPED, INVALID], VALID
+    )
+    df["reason"] = np.select(
+        [missing_roll, missing_url, ~trailhead, ~has_id],
+        ["Missing roll number", "Missing profile URL", "Not a Trailhead profile URL",
+         "Profile URL must end with a profile ID"],
+        ""
+    )
+    return df
+
+
+class IngestReport:
+    """Per-row outcome of an upload, built a chunk at a time."""
+
+    def __init__(self):
+        self.rows = []
+        self.latest = {}  # roll_number -> index in rows of its last occurrence
+
+    def add(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Validates a chunk, records it, and returns the rows to persist (last occurrence per roll)."""
+        df = validate(df)
+        keep = df["result"] != SKIPPED
+        # Within the chunk the last row for a roll number wins, as in a sequential upsert
+        superseded = keep & df["roll_number"].duplicated(keep="last")
+        df.loc[superseded, "result"] = DUPLICATE
+
+        offset = len(self.rows)
+        df["report_index"] = np.arange(offset, offset + len(df))
+        self.rows.extend(df[["row", "roll_number", "profile_id", "result", "reason"]].to_dict("records"))
+        for position, roll in zip(np.flatnonzero(keep & ~superseded), df.loc[keep & ~superseded, "roll_number"]):
+            earlier = self.latest.get(roll)
+            if earlier is not None:
+                # An earlier chunk's row for this roll was already written; this one overwrites it
+                self.rows[earlier].update(result=DUPLICATE, reason=f"Superseded by row {df['row'].iat[position]}")
+            self.latest[roll] = offset + position
+        for position in np.flatnonzero(superseded):
+            self.rows[offset + position]["reason"] = "Superseded by a later row"
+        # A copy, so diff() can add its column without writing through a slice
+        return df[keep & ~superseded].copy()
+
+    def diff(self, df: pd.DataFrame, stored: list) -> pd.DataFrame:
+        """
+        Adds a `change` column comparing each row with its stored student
+        (`stored` comes from one $in lookup over the chunk's roll numbers).
+        """
+        stored = pd.DataFrame.from_records(stored, columns=["roll_number", "profile_url", "name", "profile_id"])
+        stored = stored.drop_duplicates("roll_number", keep="last").set_index("roll_number")
+        joined = df.join(stored, on="roll_number", rsuffix="_stored")
+
+        is_new = joined["profile_url_stored"].isna()
+        # Another spelling of the same profile's URL isn't a change worth re-scraping
+        same_profile = (df["profile_id"] != "") & (joined["profile_id_stored"] == df["profile_id"])
+        url_changed = ~same_profile & (joined["profile_url_stored"].fillna("").astype(str) != df["profile_url"])
+        name_changed = joined["name_stored"].fillna("").astype(str) != df["name"]
+        df["change"] = np.select([is_new, url_changed, name_changed], [NEW, URL_CHANGED, NAME_ONLY], UNCHANGED)
+
+        for index, change in zip(df["report_index"], df["change"]):
+            self.rows[index]["change"] = change
+        return df
+
+    def summary(self) -> dict:
+        counts = {VALID: 0, INVALID: 0, SKIPPED: 0, DUPLICATE: 0}
+        changes = {NEW: 0, URL_CHANGED: 0, NAME_ONLY: 0, UNCHANGED: 0}
+        for row in self.rows:
+            counts[row["result"]] += 1
+            # Rows superseded in a later chunk keep the change they were written with
+            if row["result"] != DUPLICATE and row.get("change"):
+                changes[row["change"]] += 1
+        return {"rows": len(self.rows), "counts": counts, "changes": changes, "report": self.rows}
+
+
+def roster_writes(df: pd.DataFrame) -> list:
+    """
+    Upserts for diffed rows. New and re-pointed students are (re)set: invalid URLs
+    are marked at once, valid ones wait for a scrape. Renames only touch the name,
+    and unchanged rows aren't written at all.
+    """
+    ops = []
+    for roll, url, name, profile_id, result, change in zip(df["roll_number"], df["profile_url"], df["name"],
+                                                           df["profile_id"], df["result"], df["change"]):
+        if change == UNCHANGED:
+            continue
+        if change == NAME_ONLY:
+            ops.append(UpdateOne({"roll_number": roll}, with_derived({"name": name})))
+            continue
+        doc = {"roll_number": roll, "profile_url": url, "name": name, "profile_id": profile_id or None}
+        if result == INVALID:
+            doc.update(scrape_error=INVALID_FORMAT_ERROR, profile_status=INVALID_FORMAT, points=0, badges=0)
+            ops.append(UpdateOne({"roll_number": roll}, with_derived(doc), upsert=True))
+        else:
+            doc.update(scrape_error=PENDING_ERROR, profile_status=PENDING)
+            ops.append(UpdateOne({"roll_number": roll}, with_derived(doc, defaults=NEW_STUDENT_DEFAULTS), upsert=True))
+    return ops
+
+
+def scrape_targets(df: pd.DataFrame) -> list:
+    """Valid rows whose profile hasn't been scraped under this URL yet."""
+    due = df[(df["result"] == VALID) & df["change"].isin([NEW, URL_CHANGED])]
+    return list(zip(due["roll_number"], due["profile_url"]))
+
+
+def ingest_chunk(chunks, report: IngestReport):
+    """
+    Reads the next roster chunk, validates it, diffs it against the stored students
+    (one $in lookup) and builds its writes. Returns (upserts, scrape targets),
+    or None once the roster is exhausted. Blocking: run it off the event loop.
+    """
+    chunk = next(chunks, None)
+    if chunk is None:
+        return None
+    rows = report.add(chunk)
+    stored = list(students_collection.find({"roll_number": {"$in": rows["roll_number"].tolist()}}, STORED_PROJECTION))
+    rows = report.diff(rows, stored)
+    return roster_writes(rows), scrape_targets(rows)
@@ -0,0 +1,218 @@
+"""
+TTL cache of scrape results in front of TrailheadScraper.scrape_profile.
+
+Results are keyed by canonical profile ID and kept in a bounded in-memory LRU,
+backed by a persistent tier (one JSON file per profile on disk, or a Mongo
+collection) that is shared between processes and survives restarts. How long
+a result stays fresh depends on its profile_status; transient failures are
+never cached.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from profile_status import PUBLIC, PRIVATE, PENDING, NOT_FOUND, INVALID_FORMAT
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "2000"))
+# disk (default), mongo, or none for memory only
+SCRAPE_CACHE_STORE = os.getenv("SCRAPE_CACHE_STORE", "disk")
+SCRAPE_CACHE_DIR = os.getenv("SCRAPE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "trailhead-scrape-cache"))
+
+# Seconds a result stays fresh, by outcome; 0 disables caching that outcome
+SCRAPE_CACHE_TTLS = {
+    PUBLIC: int(os.getenv("SCRAPE_CACHE_TTL_PUBLIC_S", "900")),
+    PRIVATE: int(os.getenv("SCRAPE_CACHE_TTL_PRIVATE_S", "3600")),
+    PENDING: int(os.getenv("SCRAPE_CACHE_TTL_PENDING_S", "3600")),
+    NOT_FOUND: int(os.getenv("SCRAPE_CACHE_TTL_NOT_FOUND_S", "21600")),
+    INVALID_FORMAT: int(os.getenv("SCRAPE_CACHE_TTL_INVALID_FORMAT_S", "21600")),
+}
+
+
+class DiskStore:
+    """One JSON file per profile ID; writes are atomic, so concurrent processes can share the directory."""
+
+    def __init__(self, directory: str = SCRAPE_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Profile IDs are slugs ([a-z0-9_-]), safe as file names
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key: str, entry: dict):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    async def load(self, key: str):
+        return await asyncio.to_thread(self._load, key)
+
+    async def save(self, key: str, entry: dict):
+        await asyncio.to_thread(self._save, key, entry)
+
+
+class MongoStore:
+    """The scrape_cache collection; a TTL index removes expired entries."""
+
+    def __init__(self):
+        # Imported here so disk/memory-only processes (the daily job) never connect to Mongo
+        from database import scrape_cache_collection
+        from repository import run_db
+        self.collection = scrape_cache_collection
+        self.run_db = run_db
+        self.indexed = False
+
+    async def _ensure_index(self):
+        if not self.indexed:
+            await self.run_db(self.collection.create_index, "expires", name="expire_scrape_cache",
+                              expireAfterSeconds=0)
+            self.indexed = True
+
+    async def load(self, key: str):
+        await self._ensure_index()
+        doc = await self.run_db(self.collection.find_one, {"_id": key}, {"_id": 0, "expires_at": 1, "data": 1})
+        return doc
+
+    async def save(self, key: str, entry: dict):
+        await self._ensure_index()
+        expires = datetime.fromtimestamp(entry["expires_at"], tz=timezone.utc)
+        await self.run_db(self.collection.replace_one, {"_id": key}, {**entry, "expires": expires}, upsert=True)
+
+
+def persistent_store(kind: str = SCRAPE_CACHE_STORE):
+    """The persistent tier named by SCRAPE_CACHE_STORE, or None."""
+    if kind == "disk":
+        return DiskStore()
+    if kind == "mongo":
+        return MongoStore()
+    return None
+
+
+class ScrapeCache:
+    """
+    Two-tier TTL cache of scrape results. Lookups try the LRU, then the
+    persistent store (promoting hits into the LRU); errors in the persistent
+    tier are logged and treated as misses so they never fail a scrape.
+    """
+
+    def __init__(self, store=None, max_entries: int = SCRAPE_CACHE_MAX_ENTRIES, ttls: dict = None):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttls = SCRAPE_CACHE_TTLS if ttls is None else ttls
+        self.entries = OrderedDict()  # key -> (expires_at, data)
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.store_errors = 0
+
+    @classmethod
+    def from_env(cls):
+        try:
+            store = persistent_store()
+        except Exception as e:
+            logger.error(f"Scrape cache store '{SCRAPE_CACHE_STORE}' unavailable, using memory only: {e}")
+            store = None
+        return cls(store=store)
+
+    def ttl(self, data: dict) -> int:
+        return self.ttls.get(data.get("profile_status"), 0)
+
+    def _remember(self, key: str, expires_at: float, data: dict):
+        self.entries[key] = (expires_at, data)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str):
+        """The cached result for this profile ID, or None if absent or expired."""
+        if key is None:
+            return None
+        now = time.time()
+        cached = self.entries.get(key)
+        if cached:
+            expires_at, data = cached
+            if expires_at > now:
+                self.entries.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            del self.entries[key]
+            self.expired += 1
+
+        if self.store:
+            try:
+                entry = await self.store.load(key)
+            except Exception as e:
+                self.store_errors += 1
+                logger.warning(f"Scrape cache lookup failed for {key}: {e}")
+                entry = None
+            if entry and entry.get("expires_at", 0) > now:
+                self._remember(key, entry["expires_at"], entry["data"])
+                self.store_hits += 1
+                return entry["data"]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, data: dict):
+        """Caches a fresh result for as long as its outcome allows."""
+        ttl = self.ttl(data)
+        if key is None or ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, data)
+        self.stores += 1
+        if self.store:
+            try:
+                await self.store.save(key, {"expires_at": expires_at, "data": data})
+            except Exception as e:
+                self.store_errors += 1
+                logger.warning(f"Scrape cache write failed for {key}: {e}")
+
+    def note_bypass(self):
+        self.bypassed += 1
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.store_hits
+        lookups = hits + self.misses
+        return {
+            "store": type(self.store).__name__ if self.store else None,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttls": self.ttls,
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "expired": self.expired,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "store_errors": self.store_errors,
+        }
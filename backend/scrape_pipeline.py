@@ -0,0 +1,64 @@
+import logging
+
+from pymongo import UpdateOne
+
+from database import students_collection
+from refresh_policy import result_update
+from student_fields import DERIVED_FIELDS_STAGE, with_derived
+from profile_status import classify, TRANSIENT_ERROR
+from profile_api import canonical_profile_id
+from write_buffer import student_writes
+
+logger = logging.getLogger(__name__)
+
+
+def profile_siblings(jobs: list) -> dict:
+    """
+    Canonical profile ID -> roll numbers of every student listed under it, for a
+    claimed batch of jobs, from one $in lookup. Blocking.
+    """
+    ids = {canonical_profile_id(job.get("profile_url")) for job in jobs} - {None}
+    siblings = {}
+    if ids:
+        for s in students_collection.find({"profile_id": {"$in": list(ids)}}, {"_id": 0, "roll_number": 1, "profile_id": 1}):
+            siblings.setdefault(s["profile_id"], []).append(s["roll_number"])
+    return siblings
+
+
+async def save_scrape_result(roll_number: str, data: dict, siblings=()):
+    """
+    Persists one scrape result onto the student's record via the write-behind buffer.
+    `siblings` are other students listed under the same profile (see profile_siblings());
+    they get the result too.
+    """
+    if "error" in data:
+        logger.warning(f"⚠️  Scrape error for {roll_number}: {data['error']}")
+    else:
+        logger.info(f"✅ Successfully scraped {roll_number}: {data.get('points', 0)} points, {data.get('badges', 0)} badges")
+
+    rolls = sorted({roll_number, *siblings})
+    if len(rolls) > 1:
+        logger.info(f"📎 Sharing {roll_number}'s result with {len(rolls) - 1} other students: {rolls}")
+
+    update = result_update(data) + [DERIVED_FIELDS_STAGE]
+    # A transient failure keeps the stored numbers, so the rank index has nothing to move
+    moved = (data.get("profile_status") or classify(data.get("error"))) != TRANSIENT_ERROR
+    for roll in rolls:
+        # Also tracks the unchanged/failure streaks the incremental refresh policy reads
+        await student_writes.add(
+            roll,
+            UpdateOne({"roll_number": roll}, update),
+            # Lets the rank index move this student in place once the batch is flushed
+            meta={"roll_number": roll, "points": data.get("points", 0), "badges": data.get("badges", 0)} if moved else None
+        )
+
+
+async def mark_scrape_failed(roll_number: str, error: str):
+    """
+    Records a scrape that raised instead of returning a result.
+    """
+    logger.error(f"❌ Error processing scrape for {roll_number}: {error}")
+    await student_writes.add(roll_number, UpdateOne(
+        {"roll_number": roll_number},
+        with_derived({"is_scraping": False, "scrape_error": error, "profile_status": classify(error)})
+    ))
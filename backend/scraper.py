@@ -1,19 +1,64 @@
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import asyncio
 import logging
+import os
+import re
+
+from profile_api import ProfileApiClient, ProfileResponseCapture, canonical_profile_id
+from hydration import PhaseTimer, wait_for_profile_ready
+from page_extract import extract_profile
+from browser_pool import BrowserPool, POOL_SIZE
+from profile_status import annotate
+from concurrency import SingleFlight
+from scrape_cache import ScrapeCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Try the browser-free profile API before falling back to Chromium
+USE_HTTP_ENGINE = os.getenv("SCRAPE_HTTP_ENGINE", "1") != "0"
+
+# Read profile data from the page's own JSON responses before falling back to the DOM
+INTERCEPT_RESPONSES = os.getenv("SCRAPE_INTERCEPT_RESPONSES", "1") != "0"
+INTERCEPT_TIMEOUT_MS = int(os.getenv("SCRAPE_INTERCEPT_TIMEOUT_MS", "8000"))
+
+NETWORK_ERROR_PATTERN = re.compile(r"net::ERR_[A-Z_]+")
+
+
+def navigation_error(e: Exception) -> str:
+    """
+    Scrape error text for a failed page load. Only a URL the browser rejects is
+    permanent; timeouts and network errors are classified as transient.
+    """
+    text = str(e)
+    if "invalid url" in text.lower() or "ERR_INVALID_URL" in text:
+        return "Navigation Failed (Invalid URL)"
+    if isinstance(e, PlaywrightTimeoutError):
+        return "Navigation Timeout"
+    match = NETWORK_ERROR_PATTERN.search(text)
+    if match:
+        return f"Network Error ({match.group(0)})"
+    return "Network Error (navigation interrupted)"
+
+
 class TrailheadScraper:
-    def __init__(self):
+    def __init__(self, use_http_engine: bool = USE_HTTP_ENGINE, intercept_responses: bool = INTERCEPT_RESPONSES,
+                 pool_size: int = POOL_SIZE, cache: ScrapeCache = None):
         self.playwright = None
         self.browser = None
-        self.context = None
+        self.pool = None
+        self.pool_size = pool_size
+        self.use_http_engine = use_http_engine
+        self.intercept_responses = intercept_responses
+        self.api_client = ProfileApiClient() if use_http_engine else None
+        self.flights = SingleFlight(name="scrape")
+        self.cache = cache if cache is not None else ScrapeCache.from_env()
 
     async def start(self):
-        """Initializes the browser instance with optimized settings."""
+        """Initializes the HTTP client and the browser instance with optimized settings."""
+        if self.api_client:
+            await self.api_client.start()
         if not self.browser:
             self.playwright = await async_playwright().start()
             self.browser = await self.playwright.chromium.launch(
@@ -28,61 +73,123 @@ class TrailheadScraper:
                     "--disable-infobars"
                 ]
             )
-            # Create a persistent context with blocked resources for speed
-            self.context = await self.browser.new_context(
-                viewport={"width": 1920, "height": 1080},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
-                extra_http_headers={
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "sec-ch-ua": '"Google Chrome";v="129", "Not=A?Brand";v="8", "Chromium";v="129"',
-                    "sec-ch-ua-mobile": "?0",
-                    "sec-ch-ua-platform": '"Windows"',
-                    "Upgrade-Insecure-Requests": "1"
-                }
-            )
-            
-            # Block heavy resources - removed 'other' as it may block API calls
-            await self.context.route("**/*", lambda route: route.abort() 
-                if route.request.resource_type in ["image", "media", "font"] 
-                else route.continue_())
+            # Warm, recycled contexts and pages instead of one shared context
+            self.pool = BrowserPool(self.browser, size=self.pool_size)
                 
             logger.info("Browser started with optimized settings.")
 
     async def stop(self):
-        """Closes the browser instance."""
-        if self.context:
-            await self.context.close()
+        """Closes the HTTP client and the browser instance."""
+        if self.api_client:
+            await self.api_client.stop()
+        if self.pool:
+            await self.pool.close()
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
         self.browser = None
+        self.pool = None
         logger.info("Browser stopped.")
 
-    async def scrape_profile(self, url: str):
+    async def scrape_profile(self, url: str, force: bool = False):
+        """
+        Scrapes a single Trailhead profile. A fresh cached result for the same
+        canonical profile ID is returned without scraping unless force is set;
+        such a copy carries from_cache=True.
+        Concurrent calls for one profile ID (any URL variant) share one scrape
+        and get copies of its result.
+        """
+        key = canonical_profile_id(url)
+        if force:
+            self.cache.note_bypass()
+        else:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                logger.info(f"Scrape cache hit for {url}")
+                return {**cached, "from_cache": True}
+        data = await self.flights.do(key, lambda: self._scrape_and_cache(key, url))
+        return dict(data)
+
+    async def _scrape_and_cache(self, key, url: str):
+        data = await self._scrape_profile(url)
+        await self.cache.put(key, data)
+        return data
+
+    async def _scrape_profile(self, url: str):
         """
         Scrapes a single Trailhead profile.
+        Uses the browser-free profile API first and only loads the page in
+        Chromium when that engine can't resolve the profile.
+        Results carry a typed profile_status and the agentblazer_tier.
         """
         if not url:
-            return {"points": 0, "badges": 0, "error": "No URL provided"}
-            
+            return annotate({"points": 0, "badges": 0, "error": "No URL provided"})
+
+        if self.api_client:
+            data = await self.api_client.fetch_profile(url)
+            if data is not None:
+                logger.info(f"Resolved {url} via profile API")
+                return annotate(data)
+            logger.info(f"Falling back to browser for {url}")
+
+        return annotate(await self._scrape_with_browser(url))
+
+    async def _wait_ready_or_captured(self, page, capture):
+        """
+        Waits for the rendered tallies and the intercepted payloads side by side.
+        Returns (None, data) if interception completed first, else (readiness, None),
+        so a page that never fetches every payload costs no more than the DOM path.
+        """
+        ready = asyncio.ensure_future(wait_for_profile_ready(page))
+        if not self.intercept_responses:
+            return await ready, None
+        captured = asyncio.ensure_future(capture.wait(INTERCEPT_TIMEOUT_MS))
+        try:
+            done, _ = await asyncio.wait({ready, captured}, return_when=asyncio.FIRST_COMPLETED)
+            if captured in done and captured.result() is not None:
+                return None, captured.result()
+            return await ready, None
+        finally:
+            ready.cancel()
+            captured.cancel()
+
+    async def _scrape_with_browser(self, url: str):
+        """
+        Scrapes a single Trailhead profile by rendering it in Chromium.
+        """
         if not self.browser:
             await self.start()
 
-        page = await self.context.new_page()
+        timer = PhaseTimer()
+        slot = await self.pool.acquire()
+        page = slot.page
+        capture = ProfileResponseCapture()
+        if self.intercept_responses:
+            page.on("response", capture.on_response)
 
         try:
-            # Navigation - wait for DOM then sleep for LWC hydration
+            # Navigation - wait for DOM, then for the tallies to hydrate
             try:
                 logger.info(f"Navigating to {url}")
-                response = await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                with timer.phase("navigation"):
+                    response = await page.goto(url, wait_until="domcontentloaded", timeout=60000)
                 
                 # Check for 404 or non-success status
                 if response and response.status == 404:
                     return {"points": 0, "badges": 0, "error": "Profile Not Found (404)"}
                 
-                logger.info(f"Page loaded, waiting 5s for hydration: {url}")
-                await page.wait_for_timeout(5000) # Give LWC time to render
+                # Surface throttling so the adaptive limiter can back off
+                if response and response.status in (429, 503):
+                    return {"points": 0, "badges": 0, "error": f"Rate Limited ({response.status})"}
+                
+                with timer.phase("hydration"):
+                    readiness, data = await self._wait_ready_or_captured(page, capture)
+                if data is not None:
+                    logger.info(f"Captured profile data from network responses: {url}")
+                    data["timings"] = timer.as_dict()
+                    return data
+                logger.info(f"Hydration {readiness['state']} after {readiness['elapsed']}ms: {url}")
                 
                 # Check for redirect to generic pages which implies the specific profile wasn't accessible
                 current_url = page.url
@@ -90,108 +197,47 @@ class TrailheadScraper:
                      logger.warning(f"Redirected to generic profile for {url}")
                      return {"points": 0, "badges": 0, "error": "Profile Private/Hidden"}
                 
-                # Check 404 text in body if status didn't catch it
-                body_text = await page.content()
-                if "We can't find that page" in body_text or "Page Not Found" in body_text:
+                if readiness["state"] == "not_found":
                      return {"points": 0, "badges": 0, "error": "Profile Not Found"}
                 
-                if "This user has chosen to keep their profile private" in body_text:
+                if readiness["state"] == "private":
                     return {"points": 0, "badges": 0, "error": "Profile Private"}
 
             except Exception as e:
                 logger.warning(f"Navigation issue for {url}: {e}")
-                return {"points": 0, "badges": 0, "error": "Navigation Failed (Invalid URL)"}
+                return {"points": 0, "badges": 0, "error": navigation_error(e)}
 
-            # --- OPTIMIZED VALUE EXTRACTION ---
-            # Use Playwright's native shadow-dom piercing
+            # --- SINGLE ROUND-TRIP EXTRACTION ---
             final_points = 0
             final_badges = 0
-            
-            try:
-                # Selector that specifically targets the count inside the tally component
-                # Playwright pierces shadow roots automatically
-                counts_locator = page.locator("lwc-tbui-tally .tally__count")
-                
-                # Poll for stability
-                for i in range(6):
-                    if await counts_locator.count() > 0:
-                        texts = await counts_locator.all_inner_texts()
-                        logger.info(f"Poll {i}: Found texts {texts}")
-                        
-                        nums = []
-                        for t in texts:
-                             clean = t.replace(',', '').replace('+', '').strip()
-                             if clean.isdigit():
-                                 nums.append(int(clean))
-                        
-                        nums.sort(reverse=True)
-                        curr_points = nums[0] if len(nums) > 0 else 0
-                        curr_badges = nums[1] if len(nums) > 1 else 0
-                        
-                        if curr_points > 0 and curr_points == final_points:
-                            break
-                            
-                        final_points = curr_points
-                        final_badges = curr_badges
-                    else:
-                        logger.info(f"Poll {i}: No tally counts found yet")
-                    
-                    await asyncio.sleep(0.5)
-                    
-            except Exception as e:
-                logger.error(f"Extraction error: {e}")
-
-            # --- CERTIFICATIONS ---
             certifications = []
-            try:
-                # Strategy 1: Standard Credential Links (Unified)
-                # Matches both old /credentials/ and new /certificate/ (Trailhead Academy) links
-                cert_links = page.locator('a[href*="/credentials/certification-detail"], a[href*="/certificate/"]')
-                count = await cert_links.count()
-                for i in range(count):
-                    text = await cert_links.nth(i).inner_text()
-                    if text:
-                        certifications.append(text.strip())
-                
-                # Strategy 2: Content-Body Title (Specific structure provided)
-                if not certifications:
-                    title_links = page.locator('.content-body .title a')
-                    count = await title_links.count()
-                    for i in range(count):
-                        text = await title_links.nth(i).inner_text()
-                        if text and "Certified" in text:
-                             certifications.append(text.strip())
-
-                certifications = list(set(certifications))
-                logger.info(f"Found certs: {certifications}")
-            except Exception as e:
-                logger.error(f"Cert extraction error: {e}")
-
-            # --- AGENTBLAZER STATUS ---
             agentblazer_status = []
-            possible_statuses = ['Champion 2026', 'Innovator 2026', 'Legend 2026']
             
             try:
-                # Method 1: Check specific component text (pierces shadow dom)
-                status_locator = page.locator('lwc-tbme-agentblazer-level')
-                if await status_locator.count() > 0:
-                    status_text = await status_locator.all_inner_texts()
-                    status_text_joined = " ".join(status_text)
-                    for s in possible_statuses:
-                        if s in status_text_joined:
-                            agentblazer_status.append(s)
+                with timer.phase("extraction"):
+                    extracted = await extract_profile(page)
                 
-                # Method 2: Fallback to checking visibility of strict text locators
-                if not agentblazer_status:
-                    for s in possible_statuses:
-                        # Scan page for this exact text
-                        if await page.get_by_text(s).count() > 0:
-                            agentblazer_status.append(s)
-
+                # Prefer the counts readiness already saw settle
+                texts = readiness["counts"] or extracted["counts"]
+                logger.info(f"Found tally texts {texts}")
+                
+                nums = []
+                for t in texts:
+                     clean = t.replace(',', '').replace('+', '').strip()
+                     if clean.isdigit():
+                         nums.append(int(clean))
+                
+                nums.sort(reverse=True)
+                final_points = nums[0] if len(nums) > 0 else 0
+                final_badges = nums[1] if len(nums) > 1 else 0
+                
+                certifications = extracted["certifications"]
+                agentblazer_status = extracted["agentblazer_status"]
+                logger.info(f"Found certs: {certifications}")
                 logger.info(f"Found statuses: {agentblazer_status}")
-
+                    
             except Exception as e:
-                logger.error(f"Status extraction error: {e}")
+                logger.error(f"Extraction error: {e}")
 
             # Check if profile is valid format but returns 0 (likely private)
             if final_points == 0 and final_badges == 0:
@@ -201,14 +247,16 @@ class TrailheadScraper:
                     "badges": 0,
                     "certifications": [],
                     "agentblazer_status": [],
-                    "error": "Private URL - Cannot Access Data"
+                    "error": "Private URL - Cannot Access Data",
+                    "timings": timer.as_dict()
                 }
 
             return {
                 "points": final_points,
                 "badges": final_badges,
                 "certifications": certifications,
-                "agentblazer_status": agentblazer_status
+                "agentblazer_status": agentblazer_status,
+                "timings": timer.as_dict()
             }
 
         except Exception as e:
@@ -216,7 +264,10 @@ class TrailheadScraper:
             return {"points": 0, "badges": 0, "error": str(e)}
             
         finally:
-            await page.close()
+            logger.info(f"Scrape timings for {url}: {timer.as_dict()}")
+            if self.intercept_responses:
+                page.remove_listener("response", capture.on_response)
+            await self.pool.release(slot)
 
 # Global instance
 scraper = TrailheadScraper()
@@ -0,0 +1,189 @@
+"""
+Derived student fields, computed when a student is written instead of on every read.
+
+Every update that touches the inputs (upload rows, scrape results) ends with
+DERIVED_FIELDS_STAGE, so the flags and the search n-grams can never drift from
+the stored points/badges/certifications/agentblazer_status/name/roll_number.
+"""
+import re
+import logging
+
+from pymongo import UpdateOne
+
+from database import students_collection
+from repository import bump_data_version, bulk_write_report
+from profile_status import classify, agentblazer_tier, RANKED_STATUSES
+from profile_api import canonical_profile_id
+
+logger = logging.getLogger(__name__)
+
+# "Complete" on the leaderboard and in exports
+COMPLETE_BADGES = 10
+# Substring search matches on trigrams first, then verifies with a regex
+SEARCH_GRAM = 3
+# Bump when DERIVED_FIELDS_STAGE changes so backfill_derived_fields() rewrites old documents
+DERIVED_FIELDS_VERSION = 2
+
+
+def _has_status(status: str) -> dict:
+    return {"$anyElementTrue": [{"$map": {
+        "input": {"$ifNull": ["$agentblazer_status", []]},
+        "as": "s",
+        "in": {"$regexMatch": {"input": {"$toString": "$$s"}, "regex": re.escape(status)}}
+    }}]}
+
+
+def _grams(field: str) -> dict:
+    """Distinct lowercase trigrams of a string field, as an aggregation expression."""
+    return {"$let": {
+        "vars": {"s": {"$toLower": {"$toString": {"$ifNull": [field, ""]}}}},
+        "in": {"$map": {
+            "input": {"$range": [0, {"$max": [0, {"$subtract": [{"$strLenCP": "$$s"}, SEARCH_GRAM - 1]}]}]},
+            "as": "i",
+            "in": {"$substrCP": ["$$s", "$$i", SEARCH_GRAM]}
+        }}
+    }}
+
+
+DERIVED_FIELDS_STAGE = {"$set": {
+    "is_complete": {"$gte": [{"$ifNull": ["$badges", 0]}, COMPLETE_BADGES]},
+    "has_certifications": {"$gt": [{"$size": {"$cond": [
+        {"$isArray": "$certifications"}, "$certifications", []
+    ]}}, 0]},
+    "is_champion": _has_status("Champion 2026"),
+    "is_innovator": _has_status("Innovator 2026"),
+    "is_legend": _has_status("Legend 2026"),
+    # On the public leaderboard sheet: scraped fine, or a transient error (result_update keeps the last numbers)
+    "is_public": {"$in": [{"$ifNull": ["$profile_status", None]}, RANKED_STATUSES]},
+    "search_grams": {"$setUnion": [_grams("$name"), _grams("$roll_number")]},
+    "derived_version": DERIVED_FIELDS_VERSION
+}}
+
+
+def with_derived(fields: dict, defaults: dict = None) -> list:
+    """
+    Turns a plain $set into an update pipeline that also refreshes the derived fields.
+    `defaults` are only applied where the field is missing (the pipeline form of $setOnInsert).
+    """
+    assign = {key: {"$literal": value} for key, value in fields.items()}
+    for key, value in (defaults or {}).items():
+        assign[key] = {"$ifNull": [f"${key}", {"$literal": value}]}
+    return [{"$set": assign}, DERIVED_FIELDS_STAGE]
+
+
+def backfill_derived_fields() -> int:
+    """Computes derived fields on documents written before they existed (or by an older version)."""
+    # Stored before profile_status existed: classify the error text one last time
+    legacy = students_collection.find({"profile_status": {"$exists": False}},
+                                      {"scrape_error": 1, "agentblazer_status": 1})
+    bulk_write_report(students_collection, [
+        UpdateOne({"_id": s["_id"]}, {"$set": {
+            "profile_status": classify(s.get("scrape_error")),
+            "agentblazer_tier": agentblazer_tier(s.get("agentblazer_status"))
+        }})
+        for s in legacy
+    ])
+
+    # Stored before canonical profile IDs existed
+    unkeyed = students_collection.find({"profile_id": {"$exists": False}}, {"profile_url": 1})
+    bulk_write_report(students_collection, [
+        UpdateOne({"_id": s["_id"]}, {"$set": {"profile_id": canonical_profile_id(s.get("profile_url"))}})
+        for s in unkeyed
+    ])
+
+    result = students_collection.update_many(
+        {"derived_version": {"$ne": DERIVED_FIELDS_VERSION}},
+        [DERIVED_FIELDS_STAGE]
+    )
+    if result.modified_count:
+        bump_data_version()
+        logger.info(f"Backfilled derived fields on {result.modified_count} students")
+    return result.modified_count
+
+
+def _flag(value):
+    """Maps the UI's All/Yes/No choice onto True/False (None = no filter)."""
+    if value == "Yes":
+        return True
+    if value == "No":
+        return False
+    return None
+
+
+def _minimum(value):
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+# Filter name -> the boolean field it tests
+FLAG_FILTERS = {
+    "certs": "has_certifications",
+    "champion": "is_champion",
+    "innovator": "is_innovator",
+    "legend": "is_legend",
+}
+
+
+def normalize_filters(name=None, status="All", xp=None, badges=None, certs="All",
+                      champion="All", innovator="All", legend="All") -> dict:
+    """
+    Parses the leaderboard filters the UI, /students/search and /export share into
+    one canonical dict, so equivalent requests compare (and cache) as equal.
+    """
+    return {
+        "name": (name or "").strip().lower() or None,
+        "complete": {"Complete": True, "In Progress": False}.get(status),
+        "min_points": _minimum(xp),
+        "min_badges": _minimum(badges),
+        **{key: _flag(value) for key, value in
+           (("certs", certs), ("champion", champion), ("innovator", innovator), ("legend", legend))},
+    }
+
+
+def search_query(filters: dict, public_only: bool = True) -> dict:
+    """Builds the Mongo filter for normalize_filters() output."""
+    query = {}
+    if public_only:
+        query["is_public"] = True
+
+    term = filters.get("name")
+    if term:
+        pattern = {"$regex": re.escape(term), "$options": "i"}
+        query["$or"] = [{"name": pattern}, {"roll_number": pattern}]
+        if len(term) >= SEARCH_GRAM:
+            # Narrow on the multikey trigram index before the regex runs
+            grams = sorted({term[i:i + SEARCH_GRAM] for i in range(len(term) - SEARCH_GRAM + 1)})
+            query["search_grams"] = {"$all": grams}
+
+    if filters.get("complete") is not None:
+        query["is_complete"] = True if filters["complete"] else {"$ne": True}
+
+    if filters.get("min_points") is not None:
+        query["points"] = {"$gte": filters["min_points"]}
+    if filters.get("min_badges") is not None:
+        query["badges"] = {"$gte": filters["min_badges"]}
+
+    for key, field in FLAG_FILTERS.items():
+        if filters.get(key) is not None:
+            query[field] = True if filters[key] else {"$ne": True}
+    return query
+
+
+def _count(field: str) -> dict:
+    return {"$sum": {"$cond": [{"$eq": [f"${field}", True]}, 1, 0]}}
+
+
+# Counts over the whole filtered set, returned alongside each page of /students/search
+FACET_COUNTS = {
+    "_id": None,
+    "total": {"$sum": 1},
+    "complete": _count("is_complete"),
+    "with_certifications": _count("has_certifications"),
+    "champion": _count("is_champion"),
+    "innovator": _count("is_innovator"),
+    "legend": _count("is_legend"),
+}
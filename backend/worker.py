@@ -0,0 +1,150 @@
+"""
+Scrape worker. Claims jobs from the scrape_jobs queue and runs them through TrailheadScraper.
+
+Usage:
+    python worker.py                 # one worker process
+    python worker.py --processes 4   # four worker processes, each with its own browser
+
+Several workers (on one box or many) can share the same database.
+"""
+import os
+import sys
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from job_queue import claim_batch, complete_op, fail, ensure_queue_indexes
+from scrape_pipeline import save_scrape_result, mark_scrape_failed, profile_siblings
+from write_buffer import student_writes, job_writes
+from repository import run_db
+from concurrency import AdaptiveLimiter
+from profile_api import canonical_profile_id
+from parallel_scrape import SCRAPE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH_SIZE = int(os.getenv("SCRAPE_CLAIM_BATCH", "10"))
+POLL_INTERVAL_SECONDS = float(os.getenv("SCRAPE_POLL_INTERVAL_S", "2"))
+
+# Adaptive concurrency for scraping - starts at 5 and follows Trailhead's health
+scrape_limiter = AdaptiveLimiter(initial=5, name="worker")
+
+
+async def run_job(scraper, job, siblings=()):
+    roll_number = job["roll_number"]
+    url = job["profile_url"]
+    try:
+        async with scrape_limiter.slot() as slot:
+            logger.info(f"🔄 Starting scrape for {roll_number} - URL: {url}")
+            data = await scraper.scrape_profile(url, force=job.get("force", False))
+            slot.report(data)
+        # Result and job completion are batched by the write-behind buffers;
+        # other students listed under the same profile get the result as well
+        await save_scrape_result(roll_number, data, siblings)
+        await job_writes.add(job["_id"], complete_op(job))
+    except Exception as e:
+        retry = await run_db(fail, job, str(e))
+        if not retry:
+            await mark_scrape_failed(roll_number, str(e))
+
+
+async def run_worker(scraper, stop_event: asyncio.Event = None, worker_id: str = None):
+    """
+    Claims jobs whenever the limiter has spare capacity and scrapes them concurrently.
+    Runs until stop_event is set (forever when it is None).
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    stop_event = stop_event or asyncio.Event()
+    running = set()
+    logger.info(f"Scrape worker {worker_id} started")
+
+    while not stop_event.is_set():
+        capacity = scrape_limiter.limit - len(running)
+        jobs = []
+        siblings = {}
+        if capacity > 0:
+            try:
+                jobs = await run_db(claim_batch, worker_id, min(capacity, CLAIM_BATCH_SIZE))
+                # Students sharing a profile are resolved once per claim, not once per result
+                if jobs:
+                    siblings = await run_db(profile_siblings, jobs)
+            except Exception as e:
+                logger.error(f"Could not claim scrape jobs: {e}")
+
+        for job in jobs:
+            others = siblings.get(canonical_profile_id(job["profile_url"]), ())
+            task = asyncio.create_task(run_job(scraper, job, others))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        if not jobs:
+            # Idle or at capacity: wait for a slot to free up or for new work to arrive
+            waiters = list(running) + [asyncio.create_task(stop_event.wait())]
+            done, pending = await asyncio.wait(waiters, timeout=POLL_INTERVAL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            waiters[-1].cancel()
+
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+    await student_writes.close()
+    await job_writes.close()
+    logger.info(f"Scrape worker {worker_id} stopped")
+
+
+async def _main():
+    from scraper import scraper
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            # Finish in-flight jobs and flush buffered writes instead of dying mid-batch
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    await run_db(ensure_queue_indexes)
+    await scraper.start()
+    try:
+        await run_worker(scraper, stop_event)
+    finally:
+        await scraper.stop()
+
+
+def _process_main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run scrape queue workers.")
+    parser.add_argument("--processes", type=int, default=SCRAPE_WORKERS,
+                        help="worker processes to run, each with its own browser (default: SCRAPE_WORKERS)")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _process_main()
+        sys.exit(0)
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_process_main) for _ in range(args.processes)]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processes:
+            p.join()
@@ -0,0 +1,122 @@
+import os
+import asyncio
+import logging
+from collections import deque
+
+from database import students_collection, scrape_jobs_collection
+from repository import run_db, bulk_write_report, bump_data_version
+
+logger = logging.getLogger(__name__)
+
+# Flush when this many writes are pending, or this long after the first one arrived
+FLUSH_MAX_OPS = int(os.getenv("WRITE_BUFFER_MAX_OPS", "500"))
+FLUSH_MAX_DELAY_SECONDS = float(os.getenv("WRITE_BUFFER_MAX_DELAY_S", "1.0"))
+
+
+class BulkWriteBuffer:
+    """
+    Write-behind buffer that coalesces per-document writes into unordered bulk_write batches.
+    Writes are keyed (e.g. by roll_number); a newer write for the same key replaces the
+    pending one, so unordered execution can't reorder two writes to one document.
+    Listeners are called as listener(after_flush_result, metas) once a batch is written,
+    with the optional `meta` objects that were passed to add().
+    """
+
+    def __init__(self, collection, name: str, max_ops: int = FLUSH_MAX_OPS, max_delay: float = FLUSH_MAX_DELAY_SECONDS,
+                 after_flush=None):
+        self.collection = collection
+        self.after_flush = after_flush
+        self.listeners = []
+        self.name = name
+        self.max_ops = max_ops
+        self.max_delay = max_delay
+        self.pending = {}
+        self.flush_lock = asyncio.Lock()
+        self.timer = None
+        self.timers = set()  # strong references until each timed flush finishes
+        self.batches = deque(maxlen=20)
+        self.total_ops = 0
+        self.total_errors = 0
+
+    async def add(self, key, op, meta=None):
+        """Queues one write; flushes right away once max_ops are pending."""
+        self.pending[key] = (op, meta)
+        if len(self.pending) >= self.max_ops:
+            await self.flush()
+        else:
+            self._schedule()
+
+    def _schedule(self):
+        # A failed timed flush reschedules from inside the running timer
+        if self.timer is None or self.timer.done() or self.timer is asyncio.current_task():
+            self.timer = asyncio.create_task(self._flush_later())
+            self.timers.add(self.timer)
+            self.timer.add_done_callback(self.timers.discard)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"[{self.name} buffer] timed flush failed: {e}")
+
+    async def flush(self) -> dict:
+        """
+        Writes everything pending as one batch and returns the batch report.
+        If the batch can't be written at all (e.g. the connection dropped), it goes
+        back into pending behind any newer writes and is retried on the next timer.
+        """
+        async with self.flush_lock:
+            if not self.pending:
+                return {"ops": 0, "errors": []}
+            batch = self.pending
+            self.pending = {}
+            try:
+                report = await run_db(bulk_write_report, self.collection, [op for op, _ in batch.values()])
+            except Exception as e:
+                # Writes queued while this batch was in flight are newer and win
+                self.pending = {**batch, **self.pending}
+                report = {"ops": len(batch), "matched": 0, "modified": 0, "upserted": 0, "requeued": len(batch),
+                          "errors": [{"index": None, "code": getattr(e, "code", None), "message": f"{type(e).__name__}: {e}"}]}
+                self.batches.append(report)
+                self.total_errors += len(batch)
+                logger.error(f"[{self.name} buffer] batch of {len(batch)} writes failed, retrying: {e}")
+                self._schedule()
+                return report
+
+            try:
+                flushed = await run_db(self.after_flush) if self.after_flush else None
+            except Exception as e:
+                flushed = None
+                logger.error(f"[{self.name} buffer] after-flush hook failed: {e}")
+            metas = [meta for _, meta in batch.values() if meta is not None]
+            for listener in self.listeners:
+                try:
+                    listener(flushed, metas)
+                except Exception as e:
+                    logger.error(f"[{self.name} buffer] flush listener failed: {e}")
+
+        self.batches.append(report)
+        self.total_ops += report["ops"]
+        self.total_errors += len(report["errors"])
+        if report["errors"]:
+            logger.error(f"[{self.name} buffer] {len(report['errors'])} of {report['ops']} writes failed: {report['errors'][:5]}")
+        else:
+            logger.info(f"[{self.name} buffer] flushed {report['ops']} writes")
+        return report
+
+    async def close(self):
+        """Final flush; call on shutdown."""
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "total_ops": self.total_ops,
+            "total_errors": self.total_errors,
+            "recent_batches": list(self.batches)
+        }
+
+
+student_writes = BulkWriteBuffer(students_collection, "students", after_flush=bump_data_version)
+job_writes = BulkWriteBuffer(scrape_jobs_collection, "scrape_jobs")
@@ -5,6 +5,8 @@ const api = axios.create({
 });
 
 export const getStudents = () => api.get('/students');
+export const getStudentsPage = (params) => api.get('/students/page', { params });
+export const searchStudents = (params) => api.get('/students/search', { params });
 export const uploadFile = (formData) => api.post('/upload', formData, {
     headers: {
         'Content-Type': 'multipart/form-data',
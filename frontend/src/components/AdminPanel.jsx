@@ -230,7 +230,7 @@ const AdminPanel = () => {
                         <input
                             id="file-upload"
                             type="file"
-                            accept=".xlsx, .xls"
+                            accept=".xlsx, .xls, .csv"
                             onChange={handleFileChange}
                             style={{ display: 'block', marginBottom: '10px', color: '#e2e8f0' }}
                         />